@@ -0,0 +1,119 @@
+from pyboy.utils import WindowEvent
+
+from emulator import advance
+
+# Action Space
+ACTION_DO_NOTHING = 0
+ACTION_MOVE_LEFT = 1
+ACTION_MOVE_RIGHT = 2
+ACTION_JUMP = 3
+ACTION_CROUCH = 4
+ACTION_STRONG = 5
+ACTION_LIGHT = 6
+
+ACTION_SPACE = [
+    ACTION_DO_NOTHING,
+    ACTION_MOVE_LEFT,
+    ACTION_MOVE_RIGHT,
+    ACTION_JUMP,
+    ACTION_CROUCH,
+    ACTION_STRONG,
+    ACTION_LIGHT
+]
+
+# Press and release events for each button.
+BUTTON_EVENTS = {
+    "up": (WindowEvent.PRESS_ARROW_UP, WindowEvent.RELEASE_ARROW_UP),
+    "down": (WindowEvent.PRESS_ARROW_DOWN, WindowEvent.RELEASE_ARROW_DOWN),
+    "left": (WindowEvent.PRESS_ARROW_LEFT, WindowEvent.RELEASE_ARROW_LEFT),
+    "right": (WindowEvent.PRESS_ARROW_RIGHT, WindowEvent.RELEASE_ARROW_RIGHT),
+    "a": (WindowEvent.PRESS_BUTTON_A, WindowEvent.RELEASE_BUTTON_A),
+    "b": (WindowEvent.PRESS_BUTTON_B, WindowEvent.RELEASE_BUTTON_B),
+    "start": (WindowEvent.PRESS_BUTTON_START, WindowEvent.RELEASE_BUTTON_START),
+    "select": (WindowEvent.PRESS_BUTTON_SELECT, WindowEvent.RELEASE_BUTTON_SELECT),
+}
+
+# Buttons held down for each action.
+ACTION_BUTTONS = {
+    ACTION_DO_NOTHING: (),
+    ACTION_MOVE_LEFT: ("left",),
+    ACTION_MOVE_RIGHT: ("right",),
+    ACTION_JUMP: ("up",),
+    ACTION_CROUCH: ("down",),
+    ACTION_STRONG: ("a",),
+    ACTION_LIGHT: ("b",),
+}
+
+DEFAULT_HOLD_FRAMES = 10
+
+
+def tap(pyboy, button, hold_frames):
+    """Press a button, hold it for `hold_frames` frames and release it."""
+    press, release = BUTTON_EVENTS[button]
+    pyboy.send_input(press)
+    advance(pyboy, hold_frames)
+    pyboy.send_input(release)
+
+
+class ActionExecutor:
+    """
+    Executes actions from ACTION_SPACE as a press / hold / release schedule.
+
+    Each action presses its buttons, advances the emulator `hold_frames`
+    frames in one tick call, releases, then waits `frame_skip` more frames
+    with nothing held. The whole schedule is repeated `action_repeat` times.
+    With an `on_frame` hook the same schedule is advanced one frame per
+    tick instead, calling the hook after every frame.
+    """
+
+    def __init__(self, hold_frames=DEFAULT_HOLD_FRAMES, frame_skip=0, action_repeat=1, action_buttons=None):
+        self.hold_frames = hold_frames
+        self.frame_skip = frame_skip
+        self.action_repeat = action_repeat
+        if action_buttons is None:
+            action_buttons = ACTION_BUTTONS
+        # Precompiled (press events, release events) per action index.
+        self.schedule = [
+            (tuple(BUTTON_EVENTS[button][0] for button in action_buttons[action]),
+             tuple(BUTTON_EVENTS[button][1] for button in action_buttons[action]))
+            for action in ACTION_SPACE
+        ]
+
+    @property
+    def frames_per_action(self):
+        """Emulated frames one call to `execute` advances."""
+        return (self.hold_frames + self.frame_skip) * self.action_repeat
+
+    def execute(self, pyboy, action, on_frame=None):
+        """
+        Run the schedule for one action.
+
+        Args:
+            pyboy: PyBoy instance
+            action: One of ACTION_SPACE
+            on_frame: Optional function called with no arguments after every
+                frame, e.g. frame_stats.FrameStats.sample
+
+        Returns:
+            int: Number of frames advanced
+        """
+        presses, releases = self.schedule[action]
+        for _ in range(self.action_repeat):
+            for event in presses:
+                pyboy.send_input(event)
+            _advance_frames(pyboy, self.hold_frames, on_frame)
+            for event in releases:
+                pyboy.send_input(event)
+            if self.frame_skip:
+                _advance_frames(pyboy, self.frame_skip, on_frame)
+        return self.frames_per_action
+
+
+def _advance_frames(pyboy, frames, on_frame):
+    """Advance `frames` frames in one tick call, or one at a time calling `on_frame` after each."""
+    if on_frame is None:
+        advance(pyboy, frames)
+        return
+    for _ in range(frames):
+        advance(pyboy)
+        on_frame()
@@ -0,0 +1,341 @@
+import argparse
+import multiprocessing as mp
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import agent
+from discretizer import Discretizer
+from game_state import FIELD_INDEX, NUM_FIELDS
+from q_table import DenseQTable
+from vector_env import START_METHOD, fight_ended, wait_for_combat
+
+# Actors check for a newer published table every this many steps.
+DEFAULT_REFRESH_EVERY = 50
+
+# The learner publishes its table every this many batched updates.
+DEFAULT_PUBLISH_EVERY = 20
+
+# Transitions each actor's ring can hold before the actor starts dropping.
+DEFAULT_RING_CAPACITY = 1 << 14
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+
+# Shared blocks start with a 64-byte header of uint64 counters, so the
+# arrays after it stay aligned.
+_HEADER_BYTES = 64
+
+
+class SharedQTable:
+    """
+    Q-table values published in shared memory with a version counter.
+
+    The learner updates a private DenseQTable and calls `publish` to copy
+    it here. The version is odd while a copy is in progress, so a reader
+    that sees the same even version before and after its copy has read a
+    consistent table (a seqlock); otherwise it keeps its previous copy.
+    """
+
+    def __init__(self, block, shape, owner):
+        self.block = block
+        self.shape = tuple(shape)
+        self.owner = owner
+        self._version = np.ndarray((1,), dtype=np.uint64, buffer=block.buf)
+        self.values = np.ndarray(self.shape, dtype=np.float32, buffer=block.buf, offset=_HEADER_BYTES)
+
+    @classmethod
+    def create(cls, shape):
+        size = _HEADER_BYTES + int(np.prod(shape)) * np.dtype(np.float32).itemsize
+        table = cls(shared_memory.SharedMemory(create=True, size=size), shape, owner=True)
+        table._version[0] = 0
+        table.values.fill(0)
+        return table
+
+    @classmethod
+    def attach(cls, name, shape):
+        return cls(shared_memory.SharedMemory(name=name), shape, owner=False)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    @property
+    def version(self):
+        return int(self._version[0])
+
+    def publish(self, values):
+        """Copy `values` into shared memory and bump the version."""
+        version = self._version[0]
+        self._version[0] = version + 1
+        np.copyto(self.values, values)
+        self._version[0] = version + 2
+
+    def read_into(self, out):
+        """
+        Copy the published table into `out`.
+
+        Returns:
+            int: The version copied, or -1 if a publish was in progress
+        """
+        version = self.version
+        if version & 1:
+            return -1
+        np.copyto(out, self.values)
+        return version if self.version == version else -1
+
+    def close(self):
+        self._version = self.values = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+class TransitionRing:
+    """
+    Single-producer, single-consumer transition queue in shared memory.
+
+    The header holds two monotonically increasing counters: `head`,
+    written only by the actor, and `tail`, written only by the learner.
+    The actor fills a slot before advancing head and the learner copies
+    slots out before advancing tail, so neither side ever takes a lock.
+    When the ring is full the actor drops the transition and counts it.
+    """
+
+    def __init__(self, block, capacity, owner):
+        self.block = block
+        self.capacity = capacity
+        self.owner = owner
+        self._counters = np.ndarray((3,), dtype=np.uint64, buffer=block.buf)
+        offset = _HEADER_BYTES
+        self.states = np.ndarray((capacity, NUM_FIELDS), dtype=np.int32, buffer=block.buf, offset=offset)
+        offset += self.states.nbytes
+        self.next_states = np.ndarray((capacity, NUM_FIELDS), dtype=np.int32, buffer=block.buf, offset=offset)
+        offset += self.next_states.nbytes
+        self.actions = np.ndarray((capacity,), dtype=np.int8, buffer=block.buf, offset=offset)
+        offset += self.actions.nbytes
+        self.dones = np.ndarray((capacity,), dtype=np.bool_, buffer=block.buf, offset=offset)
+
+    @staticmethod
+    def _size(capacity):
+        return _HEADER_BYTES + capacity * (2 * NUM_FIELDS * 4 + 2)
+
+    @classmethod
+    def create(cls, capacity=DEFAULT_RING_CAPACITY):
+        ring = cls(shared_memory.SharedMemory(create=True, size=cls._size(capacity)), capacity, owner=True)
+        ring._counters.fill(0)
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity, owner=False)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    @property
+    def dropped(self):
+        return int(self._counters[2])
+
+    def push(self, state, action, next_state, done):
+        """Actor side: append one transition. Returns False if the ring was full."""
+        counters = self._counters
+        head = int(counters[0])
+        if head - int(counters[1]) >= self.capacity:
+            counters[2] += 1
+            return False
+        slot = head % self.capacity
+        self.states[slot] = state
+        self.next_states[slot] = next_state
+        self.actions[slot] = action
+        self.dones[slot] = done
+        counters[0] = head + 1
+        return True
+
+    def pop(self, max_items):
+        """
+        Learner side: remove up to `max_items` transitions.
+
+        Returns:
+            tuple: (states, actions, next_states, dones) copies, or None if empty
+        """
+        counters = self._counters
+        tail = int(counters[1])
+        count = min(int(counters[0]) - tail, max_items)
+        if count <= 0:
+            return None
+        slots = np.arange(tail, tail + count) % self.capacity
+        batch = (self.states[slots], self.actions[slots], self.next_states[slots], self.dones[slots])
+        counters[1] = tail + count
+        return batch
+
+    def close(self):
+        self._counters = self.states = self.next_states = self.actions = self.dones = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+def _actor(rom_path, table_name, shape, ring_name, ring_capacity, stop, seed,
+           refresh_every, discretizer_config, executor):
+    """
+    Actor process: play epsilon-greedy from the shared table and push
+    every transition into this actor's ring until `stop` is set.
+    """
+    from worker_pool import EmulatorWorker
+
+    worker = None
+    table = ring = None
+    try:
+        if discretizer_config:
+            agent.DISCRETIZER = Discretizer.from_config(discretizer_config)
+        if executor is not None:
+            agent.ACTION_EXECUTOR = executor
+        table = SharedQTable.attach(table_name, shape)
+        ring = TransitionRing.attach(ring_name, ring_capacity)
+        worker = EmulatorWorker(rom_path)
+        pyboy, game, start_state = worker.pyboy, worker.game, worker.start_state
+
+        rng = random.Random(seed)
+        local = np.zeros(shape, dtype=np.float32)
+        version = table.read_into(local)
+        epsilon = 1.0
+        steps = 0
+        wait_for_combat(pyboy, game, start_state)
+        last = game.read_state_array()
+        while not stop.is_set():
+            if rng.random() < epsilon:
+                action = rng.choice(agent.ACTION_SPACE)
+            else:
+                action = int(local[agent.DISCRETIZER.index(last)].argmax())
+            agent.execute_action(pyboy, action)
+            current = game.read_state_array()
+            ring.push(last, action, current, fight_ended(current, last))
+            last = current
+            if last.item(_GAME_STATE_FLAG) != agent.GAME_STATE_COMBAT:
+                wait_for_combat(pyboy, game, start_state)
+                last = game.read_state_array()
+
+            if epsilon > agent.MIN_EPSILON:
+                epsilon = max(agent.MIN_EPSILON, epsilon * agent.EPSILON_DECAY)
+            steps += 1
+            if steps % refresh_every == 0 and table.version != version:
+                latest = table.read_into(local)
+                if latest >= 0:
+                    version = latest
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if worker is not None:
+            worker.close()
+        for shared in (table, ring):
+            if shared is not None:
+                shared.close()
+
+
+def train_actor_learner(num_actors, total_transitions, rom_path=agent.ROM_PATH, batch_size=256,
+                        publish_every=DEFAULT_PUBLISH_EVERY, refresh_every=DEFAULT_REFRESH_EVERY,
+                        ring_capacity=DEFAULT_RING_CAPACITY, discretizer_config=None):
+    """
+    Train with `num_actors` actor processes feeding a learner in this process.
+
+    The learner drains the actors' rings in batches, discretizes and
+    rewards each batch with Discretizer.index_batch and
+    RewardEngine.compute_batch, applies DenseQTable.update_batch with
+    duplicate pairs averaged, and publishes the table every
+    `publish_every` updates.
+
+    Returns:
+        tuple: (DenseQTable, stats dict with transitions, updates,
+            published versions, dropped transitions, seconds)
+    """
+    q_table = DenseQTable(agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE))
+    shape = q_table.values.shape
+    table = SharedQTable.create(shape)
+    rings = [TransitionRing.create(ring_capacity) for _ in range(num_actors)]
+    ctx = mp.get_context(START_METHOD)
+    stop = ctx.Event()
+    actors = []
+    transitions = updates = 0
+    start = time.perf_counter()
+    try:
+        for index, ring in enumerate(rings):
+            process = ctx.Process(target=_actor, daemon=True,
+                                  args=(rom_path, table.name, shape, ring.name, ring_capacity, stop, index,
+                                        refresh_every, discretizer_config, agent.ACTION_EXECUTOR))
+            process.start()
+            actors.append(process)
+
+        while transitions < total_transitions:
+            learned = 0
+            for ring in rings:
+                batch = ring.pop(batch_size)
+                if batch is None:
+                    continue
+                states, actions, next_states, dones = batch
+                state_indices = agent.DISCRETIZER.index_batch(states)
+                next_indices = agent.DISCRETIZER.index_batch(next_states)
+                rewards = agent.REWARD_ENGINE.compute_batch(next_states, states)
+                q_table.update_batch(state_indices, actions, rewards, next_indices, dones,
+                                     agent.LEARNING_RATE, agent.DISCOUNT_FACTOR,
+                                     q_table.duplicate_weights(state_indices, actions))
+                learned += len(actions)
+                updates += 1
+                if updates % publish_every == 0:
+                    table.publish(q_table.values)
+            transitions += learned
+            if not learned:
+                if not any(process.is_alive() for process in actors):
+                    print("Warning: All actors exited, stopping the learner")
+                    break
+                time.sleep(0.001)
+    finally:
+        stop.set()
+        for process in actors:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        stats = {
+            "transitions": transitions,
+            "updates": updates,
+            "versions": table.version // 2,
+            "dropped": sum(ring.dropped for ring in rings),
+            "seconds": time.perf_counter() - start,
+        }
+        table.close()
+        for ring in rings:
+            ring.close()
+    return q_table, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train with parallel actor processes and one batched learner.")
+    parser.add_argument("--actors", type=int, default=max(1, mp.cpu_count() - 1), help="emulator actor processes")
+    parser.add_argument("--transitions", type=int, default=100000, help="transitions to learn from")
+    parser.add_argument("--batch-size", type=int, default=256, help="transitions per learner update")
+    parser.add_argument("--publish-every", type=int, default=DEFAULT_PUBLISH_EVERY,
+                        help="learner updates between table publishes")
+    parser.add_argument("--refresh-every", type=int, default=DEFAULT_REFRESH_EVERY,
+                        help="actor steps between checks for a newer table")
+    parser.add_argument("--ring-capacity", type=int, default=DEFAULT_RING_CAPACITY,
+                        help="transitions buffered per actor")
+    parser.add_argument("--discretizer-config", help="Discretizer JSON config")
+    parser.add_argument("--reward-config", help="RewardEngine JSON config")
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    parser.add_argument("--output", default="q_table.npy", help="where to save the trained Q-table")
+    args = parser.parse_args()
+
+    if args.discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(args.discretizer_config)
+    if args.reward_config:
+        agent.REWARD_ENGINE = agent.RewardEngine.from_config(args.reward_config)
+
+    q_table, stats = train_actor_learner(args.actors, args.transitions, args.rom, args.batch_size,
+                                         args.publish_every, args.refresh_every, args.ring_capacity,
+                                         args.discretizer_config)
+    q_table.save(args.output)
+    print(f"Learned from {stats['transitions']} transitions in {stats['updates']} updates "
+          f"({stats['transitions'] / stats['seconds']:.0f}/s), published {stats['versions']} versions, "
+          f"dropped {stats['dropped']}. Q-table saved to {args.output}.")
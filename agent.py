@@ -0,0 +1,324 @@
+import random
+from actions import (
+    ACTION_SPACE,
+    ActionExecutor,
+)
+from memory_watch import tap_until_changes
+from discretizer import Discretizer
+from game_state import FIELD_INDEX, round_decided
+from profiling import (
+    PHASE_DISCRETIZE,
+    PHASE_EMULATION,
+    PHASE_LEARN,
+    PHASE_REWARD,
+    PHASE_STATE_READ,
+    Profiler,
+)
+from rewards import RewardEngine
+from telemetry import (
+    DEBUG,
+    ERROR,
+    EVENT_ERROR,
+    EVENT_STEP,
+    INFO,
+    Telemetry,
+)
+
+ROM_PATH = 'PowerQuest.gb'
+
+# Q-Learning Constants (moved to global scope)
+LEARNING_RATE = 0.1
+DISCOUNT_FACTOR = 0.9
+EPSILON_DECAY = 0.9999
+MIN_EPSILON = 0.01
+
+# Executes fight actions. main() applies the --hold-frames,
+# --frame-skip and --action-repeat options to it.
+ACTION_EXECUTOR = ActionExecutor()
+
+# Maps state arrays to Q-table rows. main() replaces it when
+# --discretizer-config is given.
+DISCRETIZER = Discretizer()
+
+# Computes fight rewards. main() replaces it when --reward-config is given.
+REWARD_ENGINE = RewardEngine()
+
+# Records training events and filters console messages. main() replaces it
+# according to --telemetry, --log-level and --telemetry-sample.
+TELEMETRY = Telemetry()
+
+# Records fight transitions for offline training when --record is given.
+RECORDER = None
+
+# Logs each episode's start state, seed and actions for rollouts.py when
+# --rollout-log is given.
+ROLLOUT_LOG = None
+
+# Per-frame state samples of the current action, when --frame-stats is
+# given. Rewards and episode ends are then computed from every frame of the
+# hold window rather than only its last one.
+FRAME_STATS = None
+
+# Per-phase step timers. Disabled unless --profile is given or the
+# process receives SIGUSR1.
+PROFILER = Profiler()
+
+# Dialogue handling: frames A is held, frames to wait for the press to
+# change the game state flag, ignored presses before trying another
+# button, and the overall frame budget per call.
+DIALOGUE_PRESS_FRAMES = 2
+DIALOGUE_WAIT_FRAMES = 8
+DIALOGUE_STUCK_PRESSES = 20
+DIALOGUE_TIMEOUT = 600
+
+# Game state constants for better readability
+GAME_STATE_MENU = 0xC0
+GAME_STATE_HOME = 0xC1
+GAME_STATE_DIALOGUE = 0xC2
+GAME_STATE_COMBAT = 0xC3
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+
+def get_game_state_name(state_flag):
+    """Convert game state flag to human-readable name."""
+    state_names = {
+        GAME_STATE_MENU: "Menu",
+        GAME_STATE_HOME: "Home",
+        GAME_STATE_DIALOGUE: "Dialogue",
+        GAME_STATE_COMBAT: "Combat"
+    }
+    return state_names.get(state_flag, f"Unknown(0x{state_flag:02X})")
+
+
+def execute_action(pyboy, action):
+    """
+    Press the button for an action, hold it and release it using ACTION_EXECUTOR.
+
+    Args:
+        pyboy: PyBoy instance
+        action: One of ACTION_SPACE
+    """
+    ACTION_EXECUTOR.execute(pyboy, action)
+
+
+def choose_action(q_table, state, epsilon, rng=random):
+    """
+    Epsilon-greedy action selection.
+
+    Args:
+        q_table: DenseQTable
+        state: State index
+        epsilon: Exploration rate
+        rng: random.Random the exploration draws come from (default: the random module)
+
+    Returns:
+        int: Action from ACTION_SPACE
+    """
+    if rng.uniform(0, 1) < epsilon:
+        return rng.choice(ACTION_SPACE)
+    return q_table.best_action(state)
+
+
+def q_update(q_table, state, action, reward, next_state, done=False):
+    """
+    Apply one Q-learning update with the module learning rate and discount.
+
+    Args:
+        q_table: DenseQTable
+        state: State index the action was taken in
+        action: Action taken
+        reward: Reward received
+        next_state: State index after the action
+        done: True if next_state ends the episode and must not be bootstrapped from
+
+    Returns:
+        float: The change applied to the Q-value
+    """
+    return q_table.update(state, action, reward, next_state, LEARNING_RATE, DISCOUNT_FACTOR, done)
+
+
+def replay_update(q_table, replay, batch_size):
+    """
+    Apply one minibatch Q-update sampled from the replay buffer.
+
+    Args:
+        q_table: DenseQTable
+        replay: ReplayBuffer or PrioritizedReplayBuffer
+        batch_size: Transitions per minibatch
+    """
+    if len(replay) < batch_size:
+        return
+    indices, states, actions, rewards, next_states, dones, weights = replay.sample(batch_size)
+    # A minibatch often repeats a pair, most of all with prioritized
+    # sampling, so average those updates instead of summing them.
+    duplicate_weights = q_table.duplicate_weights(states, actions)
+    if weights is not None:
+        duplicate_weights *= weights
+    td_errors = q_table.update_batch(states, actions, rewards, next_states, dones,
+                                     LEARNING_RATE, DISCOUNT_FACTOR, duplicate_weights)
+    replay.update_priorities(indices, td_errors)
+
+
+def game_state_fight(pyboy, game, q_table, last_game_state, discretized_last_game_state, epsilon,
+                     replay=None, replay_batch=32, rng=random):
+    """
+    Handle the fighting game state using Q-learning.
+    
+    Args:
+        pyboy: PyBoy instance
+        game: GameState instance
+        q_table: DenseQTable
+        last_game_state: Previous state array from GameState.read_state_array
+        discretized_last_game_state: Previous state index
+        epsilon: Exploration rate
+        replay: Optional replay buffer. Each transition is stored and a
+            minibatch of replayed transitions is learned from every step.
+        replay_batch: Minibatch size for replay updates
+        rng: random.Random for epsilon-greedy, seeded per episode by main()
+        
+    Returns:
+        tuple: Updated q_table, current_game_state, discretized_current_game_state, epsilon
+    """
+    try:
+        action = choose_action(q_table, discretized_last_game_state, epsilon, rng)
+
+        start = PROFILER.start()
+        if FRAME_STATS is not None:
+            FRAME_STATS.begin(last_game_state)
+            frames = ACTION_EXECUTOR.execute(pyboy, action, FRAME_STATS.sample)
+        else:
+            frames = ACTION_EXECUTOR.execute(pyboy, action)
+        PROFILER.stop(PHASE_EMULATION, start)
+
+        # Get current state and calculate reward
+        start = PROFILER.start()
+        if FRAME_STATS is not None:
+            current_game_state = FRAME_STATS.current.copy()
+        else:
+            current_game_state = game.read_state_array()
+        PROFILER.stop(PHASE_STATE_READ, start)
+
+        start = PROFILER.start()
+        if FRAME_STATS is not None:
+            reward = REWARD_ENGINE.compute_window(FRAME_STATS.window)
+        else:
+            reward = REWARD_ENGINE.compute(current_game_state, last_game_state)
+        PROFILER.stop(PHASE_REWARD, start)
+
+        start = PROFILER.start()
+        discretized_current_game_state = DISCRETIZER.index(current_game_state)
+        PROFILER.stop(PHASE_DISCRETIZE, start)
+
+        # The fight ends when a round is decided or combat is left; the
+        # state after that must not be bootstrapped from. With frame stats
+        # both are checked on every frame of the action, so a round that is
+        # decided and reset, or combat left and re-entered, mid-action still
+        # ends the episode.
+        if FRAME_STATS is not None:
+            decided = FRAME_STATS.round_decided()
+            done = decided or FRAME_STATS.left_combat(GAME_STATE_COMBAT)
+        else:
+            decided = round_decided(current_game_state, last_game_state)
+            done = decided or current_game_state.item(_GAME_STATE_FLAG) != GAME_STATE_COMBAT
+
+        start = PROFILER.start()
+        q_delta = q_update(q_table, discretized_last_game_state, action, reward, discretized_current_game_state,
+                           done)
+        if replay is not None:
+            replay.add(discretized_last_game_state, action, reward, discretized_current_game_state, done)
+            replay_update(q_table, replay, replay_batch)
+        PROFILER.stop(PHASE_LEARN, start)
+
+        PROFILER.count("frames", frames)
+        PROFILER.count("mem_reads", frames if FRAME_STATS is not None else 1)
+
+        # Update epsilon
+        if epsilon > MIN_EPSILON:
+            epsilon *= EPSILON_DECAY
+
+        if RECORDER is not None:
+            RECORDER.add(last_game_state, action, reward, current_game_state, done)
+        if ROLLOUT_LOG is not None:
+            ROLLOUT_LOG.add(action, reward)
+
+        TELEMETRY.record(EVENT_STEP, INFO, current_game_state.item(_GAME_STATE_FLAG), action, reward, epsilon, q_delta)
+        if decided:
+            TELEMETRY.end_episode()
+        PROFILER.end_step()
+        
+        return q_table, current_game_state, discretized_current_game_state, epsilon
+        
+    except Exception as e:
+        TELEMETRY.record(EVENT_ERROR, ERROR)
+        TELEMETRY.log(ERROR, f"Error in game_state_fight: {e}")
+        return q_table, last_game_state, discretized_last_game_state, epsilon
+
+
+def handle_dialogue(pyboy, game, dialogue_timeout=DIALOGUE_TIMEOUT):
+    """
+    Handle dialogue, menu and round-transition screens until combat starts.
+
+    Presses A and watches the game state flag on every frame of the press
+    and after it instead of mashing on a fixed schedule, so it returns on
+    the first frame of combat. If A stops having an effect, the fallback strategies
+    are tried in order.
+    
+    Args:
+        pyboy: PyBoy instance
+        game: GameState instance
+        dialogue_timeout: Maximum number of frames to spend in dialogue
+        
+    Returns:
+        bool: True if dialogue was handled successfully, False if timeout
+    """
+    TELEMETRY.log(DEBUG, "Handling dialogue encounter...")
+    
+    # Fallback strategies when A keeps being ignored: (button, frames held)
+    strategies = [
+        # Strategy 1: Hold A longer
+        ("a", 10),
+        
+        # Strategy 2: Press B instead of A
+        ("b", 5),
+        
+        # Strategy 3: Press Start
+        ("start", 5),
+    ]
+    
+    frames_in_dialogue = 0
+    strategy_index = 0
+    ignored_presses = 0
+    
+    while frames_in_dialogue < dialogue_timeout:
+        current_state = game.game_state_flag
+        PROFILER.count("mem_reads")
+        if current_state == GAME_STATE_COMBAT:
+            TELEMETRY.log(DEBUG, f"Dialogue resolved after {frames_in_dialogue} frames")
+            return True
+
+        if ignored_presses >= DIALOGUE_STUCK_PRESSES and strategy_index < len(strategies):
+            button, hold_frames = strategies[strategy_index]
+            TELEMETRY.log(DEBUG, f"Trying dialogue strategy {strategy_index + 1} (stuck in {get_game_state_name(current_state)})")
+            strategy_index += 1
+            ignored_presses = 0
+        else:
+            button, hold_frames = "a", DIALOGUE_PRESS_FRAMES
+        # Stop on the first frame the flag changes, during the hold or after it.
+        frames, changed = tap_until_changes(
+            pyboy, button, hold_frames, game.memory_map.field("game_state_flag").address,
+            min(DIALOGUE_WAIT_FRAMES, max(dialogue_timeout - frames_in_dialogue - hold_frames, 0))
+        )
+        PROFILER.count("mem_reads", frames + 1)
+        PROFILER.count("dialogue_frames", frames)
+        frames_in_dialogue += frames
+
+        if changed:
+            ignored_presses = 0
+            TELEMETRY.log(DEBUG, f"Dialogue state changed to: {get_game_state_name(game.game_state_flag)}")
+        else:
+            ignored_presses += 1
+
+    if game.game_state_flag == GAME_STATE_COMBAT:
+        return True
+    TELEMETRY.log(INFO, f"Dialogue timeout reached after {dialogue_timeout} frames")
+    return False
@@ -0,0 +1,222 @@
+import argparse
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+import agent
+from fake_emulator import FAKE_MEMORY_MAP, FakePyBoy
+from game_state import FIELD_INDEX, GameState
+from macros import MENU_MACRO
+from pixels import FrameStack
+from q_table import DenseQTable
+
+
+class _CountingMemory:
+    """Forwards memory reads to the emulator and counts them."""
+
+    def __init__(self, memory):
+        self._memory = memory
+        self.reads = 0
+
+    def __getitem__(self, address):
+        self.reads += 1
+        return self._memory[address]
+
+    def __setitem__(self, address, value):
+        self._memory[address] = value
+
+
+class InstrumentedEmulator:
+    """Wraps a real or fake PyBoy and counts frames, tick calls and memory reads."""
+
+    def __init__(self, pyboy):
+        self.pyboy = pyboy
+        self.memory = _CountingMemory(pyboy.memory)
+        self.frames = 0
+        self.tick_calls = 0
+
+    def tick(self, count=1, render=True):
+        self.frames += count
+        self.tick_calls += 1
+        return self.pyboy.tick(count, render)
+
+    def send_input(self, event):
+        self.pyboy.send_input(event)
+
+    def reset_counters(self):
+        self.memory.reads = 0
+        self.frames = 0
+        self.tick_calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self.pyboy, name)
+
+
+def bench_state_snapshot(pyboy, game, steps):
+    for _ in range(steps):
+        game.get_state_snapshot()
+
+
+def bench_state_array(pyboy, game, steps):
+    for _ in range(steps):
+        game.read_state_array()
+
+
+def bench_discretize(pyboy, game, steps):
+    state = game.read_state_array()
+    for _ in range(steps):
+        agent.DISCRETIZER.index(state)
+
+
+def _reward_pair(game):
+    last = game.read_state_array()
+    current = last.copy()
+    current[FIELD_INDEX["player_health"]] -= 100
+    current[FIELD_INDEX["enemy_health"]] -= 200
+    return current, last
+
+
+def bench_discretize_batch(pyboy, game, steps):
+    agent.DISCRETIZER.index_batch(np.tile(game.read_state_array(), (steps, 1)))
+
+
+def bench_pixels(pyboy, game, steps):
+    frames = FrameStack(pyboy.screen.ndarray)
+    for _ in range(steps):
+        frames.push()
+        frames.stacked()
+
+
+def bench_calculate_reward(pyboy, game, steps):
+    current, last = _reward_pair(game)
+    for _ in range(steps):
+        agent.REWARD_ENGINE.compute(current, last)
+
+
+def bench_reward_batch(pyboy, game, steps):
+    current, last = _reward_pair(game)
+    agent.REWARD_ENGINE.compute_batch(np.tile(current, (steps, 1)), np.tile(last, (steps, 1)))
+
+
+def bench_fight_step(pyboy, game, steps):
+    q_table = DenseQTable(agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE))
+    last = game.read_state_array()
+    state = agent.DISCRETIZER.index(last)
+    epsilon = 0.5
+    for _ in range(steps):
+        q_table, last, state, epsilon = agent.game_state_fight(pyboy, game, q_table, last, state, epsilon)
+
+
+def bench_dialogue(pyboy, game, steps):
+    for _ in range(steps):
+        if isinstance(pyboy.pyboy, FakePyBoy):
+            pyboy.pyboy.start_round_transition()
+        agent.handle_dialogue(pyboy, game)
+
+
+BENCHMARKS = {
+    "state_snapshot": bench_state_snapshot,
+    "state_array": bench_state_array,
+    "discretize": bench_discretize,
+    "discretize_batch": bench_discretize_batch,
+    "pixels": bench_pixels,
+    "calculate_reward": bench_calculate_reward,
+    "reward_batch": bench_reward_batch,
+    "fight_step": bench_fight_step,
+    "dialogue": bench_dialogue,
+}
+
+
+def run_benchmark(name, pyboy, game, steps, alloc_steps):
+    """
+    Time one benchmark and count its emulator work and allocations.
+
+    Returns:
+        dict: steps/s, frames/s, memory reads and tick calls per step, and
+            net allocated blocks per step measured with tracemalloc
+    """
+    bench = BENCHMARKS[name]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        pyboy.reset_counters()
+        start = time.perf_counter()
+        bench(pyboy, game, steps)
+        elapsed = time.perf_counter() - start
+        frames, reads, tick_calls = pyboy.frames, pyboy.memory.reads, pyboy.tick_calls
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        bench(pyboy, game, alloc_steps)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    net_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "benchmark": name,
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed else float("inf"),
+        "frames_per_second": frames / elapsed if elapsed else float("inf"),
+        "memory_reads_per_step": reads / steps,
+        "tick_calls_per_step": tick_calls / steps,
+        "net_blocks_per_step": net_blocks / alloc_steps,
+    }
+
+
+def create_backend(backend, rom_path, seed):
+    """Create the emulator for a backend name ("fake" or "rom")."""
+    if backend == "fake":
+        return InstrumentedEmulator(FakePyBoy(seed))
+
+    from emulator import create_emulator
+    from start_state import StartStateCache
+
+    pyboy = create_emulator(rom_path, headless=True)
+    StartStateCache(pyboy, rom_path, MENU_MACRO).prepare()
+    return InstrumentedEmulator(pyboy)
+
+
+def print_results(results):
+    header = f"{'backend':<8}{'benchmark':<18}{'steps/s':>12}{'frames/s':>12}{'reads/step':>12}{'ticks/step':>12}{'blocks/step':>13}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['backend']:<8}{result['benchmark']:<18}"
+              f"{result['steps_per_second']:>12.0f}{result['frames_per_second']:>12.0f}"
+              f"{result['memory_reads_per_step']:>12.1f}{result['tick_calls_per_step']:>12.1f}"
+              f"{result['net_blocks_per_step']:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure step throughput of the agent's hot paths.")
+    parser.add_argument("--steps", type=int, default=10000, help="iterations per benchmark")
+    parser.add_argument("--alloc-steps", type=int, default=500, help="iterations traced for allocation counts")
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="ROM to benchmark against when present")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the fake emulator")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--profile", action="store_true", help="also print the per-phase step profile")
+    args = parser.parse_args()
+
+    backends = ["fake"] + (["rom"] if os.path.exists(args.rom) else [])
+    results = []
+    for backend in backends:
+        pyboy = create_backend(backend, args.rom, args.seed)
+        game = GameState(pyboy, FAKE_MEMORY_MAP if backend == "fake" else None)
+        agent.PROFILER.reset()
+        agent.PROFILER.enabled = args.profile
+        for name in args.benchmarks:
+            result = run_benchmark(name, pyboy, game, args.steps, args.alloc_steps)
+            result["backend"] = backend
+            results.append(result)
+        pyboy.stop(False)
+        if args.profile:
+            print(f"[{backend}] {agent.PROFILER.summary()}")
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+
+from q_table import DenseQTable
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _atomic_write(path, write):
+    """
+    Write a file through a temporary file, fsync it and rename it into place,
+    so readers only ever see the old or the complete new file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as tmp_file:
+        write(tmp_file)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, path)
+
+
+class Checkpointer:
+    """
+    Incremental, crash-safe Q-table checkpoints.
+
+    A checkpoint directory holds one full base table, a chain of delta files
+    with only the rows changed since the previous checkpoint, and a manifest
+    naming them together with epsilon and the step counter. The manifest is
+    replaced last, so a crash mid-checkpoint leaves the previous checkpoint
+    intact. After `full_every` deltas the next checkpoint writes a new base.
+    """
+
+    def __init__(self, directory, full_every=20):
+        self.directory = directory
+        self.full_every = full_every
+        self.manifest = None
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, q_table, epsilon, steps):
+        """
+        Write a checkpoint for the rows of `q_table` changed since the last one.
+
+        Args:
+            q_table: DenseQTable being trained
+            epsilon: Current exploration rate
+            steps: Training steps taken so far
+
+        Returns:
+            bool: True if the checkpoint was written
+        """
+        try:
+            manifest = self.manifest
+            sequence = 0 if manifest is None else manifest["sequence"] + 1
+
+            # A table of another shape, e.g. after a resume that found a
+            # mismatched checkpoint, cannot be stored as a delta of it.
+            if (manifest is None or manifest["shape"] != list(q_table.values.shape)
+                    or len(manifest["deltas"]) >= self.full_every):
+                base = f"base_{sequence:06d}.npy"
+                _atomic_write(os.path.join(self.directory, base), lambda f: np.save(f, q_table.values))
+                deltas = []
+            else:
+                base = manifest["base"]
+                rows = q_table.dirty_rows()
+                delta = f"delta_{sequence:06d}.npz"
+                _atomic_write(os.path.join(self.directory, delta),
+                              lambda f: np.savez(f, rows=rows, values=q_table.values[rows]))
+                deltas = manifest["deltas"] + [delta]
+
+            new_manifest = {
+                "sequence": sequence,
+                "shape": list(q_table.values.shape),
+                "base": base,
+                "deltas": deltas,
+                "epsilon": epsilon,
+                "steps": steps,
+            }
+            _atomic_write(os.path.join(self.directory, MANIFEST_NAME),
+                          lambda f: f.write(json.dumps(new_manifest, indent=2).encode()))
+            q_table.clear_dirty()
+            self.manifest = new_manifest
+            self._remove_stale_files()
+            return True
+        except Exception as e:
+            print(f"Warning: Checkpoint to {self.directory} failed: {e}")
+            return False
+
+    def load(self):
+        """
+        Rebuild the Q-table from the latest checkpoint.
+
+        Returns:
+            tuple: (q_table, epsilon, steps), or None if there is no checkpoint
+        """
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+
+        values = np.load(os.path.join(self.directory, manifest["base"]))
+        for delta in manifest["deltas"]:
+            with np.load(os.path.join(self.directory, delta)) as delta_file:
+                values[delta_file["rows"]] = delta_file["values"]
+
+        num_states, num_actions = manifest["shape"]
+        q_table = DenseQTable(num_states, num_actions, values)
+        self.manifest = manifest
+        return q_table, manifest["epsilon"], manifest["steps"]
+
+    def _remove_stale_files(self):
+        """Delete base and delta files the manifest no longer refers to."""
+        live = {self.manifest["base"], *self.manifest["deltas"]}
+        for name in os.listdir(self.directory):
+            if name.endswith((".npy", ".npz")) and name not in live:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
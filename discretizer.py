@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+
+from game_state import FIELD_INDEX, SNAPSHOT_FIELDS
+
+# Discretizer features: (name, source, bucket boundaries). A source is a
+# snapshot field name or ("abs_diff", field_a, field_b). A value v falls in
+# bucket i when boundaries[i - 1] <= v < boundaries[i].
+DEFAULT_FEATURES = (
+    ("player_health", "player_health", (6001, 18001)),
+    ("enemy_health", "enemy_health", (6001, 18001)),
+    ("distance", ("abs_diff", "player_x_position", "enemy_x_position"), (40, 80)),
+)
+
+# Largest value each field can hold, from its width in the snapshot layout.
+FIELD_MAX = {name: (1 << (8 * width)) - 1 for name, width in SNAPSHOT_FIELDS}
+
+
+class Discretizer:
+    """
+    Maps state arrays (GameState.read_state_array) to flat state indices.
+
+    Every feature gets a lookup table over all values its source can take,
+    so bucketing a value is one table lookup. The flat index is the
+    mixed-radix combination of the bucket indices, first feature most
+    significant.
+    """
+
+    def __init__(self, features=DEFAULT_FEATURES):
+        self.features = tuple((name, source if isinstance(source, str) else tuple(source), tuple(boundaries))
+                              for name, source, boundaries in features)
+        self.names = tuple(name for name, _, _ in self.features)
+        self.sizes = tuple(len(boundaries) + 1 for _, _, boundaries in self.features)
+        self.num_states = int(np.prod(self.sizes))
+        self.strides = tuple(int(np.prod(self.sizes[i + 1:])) for i in range(len(self.sizes)))
+
+        # Per feature: (first field index, second field index or None,
+        # lookup table as a list for single states and as an array for batches, stride)
+        self._compiled = []
+        for (name, source, boundaries), stride in zip(self.features, self.strides):
+            if isinstance(source, str):
+                fields = (source,)
+            elif source[0] == "abs_diff" and len(source) == 3:
+                fields = source[1:]
+            else:
+                raise ValueError(f"Feature '{name}' has an invalid source {source!r}")
+            for field in fields:
+                if field not in FIELD_INDEX:
+                    raise ValueError(f"Feature '{name}' uses unknown field '{field}'")
+            if list(boundaries) != sorted(boundaries):
+                raise ValueError(f"Feature '{name}' boundaries must be increasing")
+            max_value = max(FIELD_MAX[field] for field in fields)
+            lut = np.digitize(np.arange(max_value + 1), boundaries).astype(np.intp)
+            second = FIELD_INDEX[fields[1]] if len(fields) == 2 else None
+            self._compiled.append((FIELD_INDEX[fields[0]], second, lut.tolist(), lut, stride))
+        self._compiled = tuple(self._compiled)
+
+    @classmethod
+    def from_config(cls, path):
+        """
+        Load features from a JSON file such as
+        {"features": [{"name": "distance", "abs_diff": ["player_x_position", "enemy_x_position"],
+                       "boundaries": [40, 80]}, {"name": "player_health", "field": "player_health", ...}]}.
+        """
+        with open(path, "r") as config_file:
+            config = json.load(config_file)
+        features = []
+        for feature in config["features"]:
+            source = feature["field"] if "field" in feature else ("abs_diff", *feature["abs_diff"])
+            features.append((feature["name"], source, feature["boundaries"]))
+        return cls(features)
+
+    def index(self, state):
+        """Flat state index for one state array."""
+        result = 0
+        for first, second, lut, _, stride in self._compiled:
+            value = state.item(first)
+            if second is not None:
+                value = abs(value - state.item(second))
+            result += lut[value] * stride
+        return result
+
+    def index_batch(self, states):
+        """
+        Flat state indices for a batch of state arrays.
+
+        Args:
+            states: (N, NUM_FIELDS) integer array, converted to int32 so differences cannot wrap
+
+        Returns:
+            np.ndarray: (N,) state indices
+        """
+        states = np.asarray(states, dtype=np.int32)
+        result = np.zeros(len(states), dtype=np.intp)
+        for first, second, _, lut, stride in self._compiled:
+            values = states[:, first]
+            if second is not None:
+                values = np.abs(values - states[:, second])
+            result += lut[values] * stride
+        return result
+
+    def buckets(self, state_index):
+        """Split a flat state index into one bucket index per feature."""
+        return tuple((state_index // stride) % size for stride, size in zip(self.strides, self.sizes))
+
+    def describe(self, state_index):
+        """Human-readable form of a state index, e.g. "player_health=2 enemy_health=1 distance=0"."""
+        return " ".join(f"{name}={bucket}" for name, bucket in zip(self.names, self.buckets(state_index)))
@@ -0,0 +1,39 @@
+from pyboy import PyBoy
+
+# Whether ticks render the screen. Headless training only needs memory, so
+# rendering is switched off for it. One emulator per process, so a module
+# flag is enough.
+RENDER = True
+
+
+def create_emulator(rom_path, headless=False, render=None):
+    """
+    Create a PyBoy instance.
+
+    Args:
+        rom_path: Path to the ROM
+        headless: Use a null window, no sound, no rendering and unlimited emulation speed
+        render: Override whether ticks render, e.g. True for headless pixel observations
+
+    Returns:
+        PyBoy: The emulator
+    """
+    global RENDER
+    if headless:
+        pyboy = PyBoy(rom_path, window="null", sound_emulated=False)
+        pyboy.set_emulation_speed(0)
+    else:
+        pyboy = PyBoy(rom_path)
+    RENDER = not headless if render is None else render
+    return pyboy
+
+
+def advance(pyboy, frames=1):
+    """
+    Advance the emulator by `frames` frames in a single tick call.
+    When rendering is on only the last frame is drawn.
+
+    Returns:
+        bool: False once the emulator window has been closed
+    """
+    return pyboy.tick(frames, RENDER)
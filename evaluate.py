@@ -0,0 +1,203 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+
+import agent
+from discretizer import Discretizer
+from emulator import advance
+from game_state import FIELD_INDEX, round_decided
+from q_table import DenseQTable
+from vector_env import wait_for_combat
+from worker_pool import EmulatorPool
+
+# Each worker idles a random number of frames up to this before its first
+# round. Greedy play from the same start state is deterministic, so
+# without it every worker would replay the same fights.
+START_JITTER_FRAMES = 120
+
+# A round still undecided after this many decisions is counted as a timeout.
+MAX_STEPS_PER_ROUND = 5000
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+_PLAYER_HEALTH = FIELD_INDEX["player_health"]
+_ENEMY_HEALTH = FIELD_INDEX["enemy_health"]
+_PLAYER_WINS = FIELD_INDEX["player_wins"]
+_ENEMY_WINS = FIELD_INDEX["enemy_wins"]
+
+
+def play_rounds(worker, q_values, rounds, seed, discretizer_config=None, executor=None,
+                max_steps_per_round=MAX_STEPS_PER_ROUND):
+    """
+    Play `rounds` rounds with the greedy policy of `q_values`. An
+    EmulatorPool job, so the discretizer config and ActionExecutor the
+    table was trained with are passed in.
+
+    Returns:
+        dict: Totals for merge_results (rounds, wins, losses, timeouts,
+            health differential, fight frames, decisions, seconds)
+    """
+    if discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(discretizer_config)
+    if executor is not None:
+        agent.ACTION_EXECUTOR = executor
+    q_table = DenseQTable(*q_values.shape, q_values)
+    frames_per_step = agent.ACTION_EXECUTOR.frames_per_action
+    totals = {"rounds": 0, "wins": 0, "losses": 0, "timeouts": 0, "health_differential": 0,
+              "frames": 0, "decisions": 0, "seconds": 0.0}
+
+    pyboy, game, start_state = worker.pyboy, worker.game, worker.start_state
+    advance(pyboy, random.Random(seed).randrange(START_JITTER_FRAMES + 1))
+
+    start = time.perf_counter()
+    while totals["rounds"] < rounds:
+        wait_for_combat(pyboy, game, start_state)
+        last = game.read_state_array()
+        for step in range(1, max_steps_per_round + 1):
+            agent.execute_action(pyboy, q_table.best_action(agent.DISCRETIZER.index(last)))
+            current = game.read_state_array()
+            if round_decided(current, last):
+                totals["wins"] += current.item(_PLAYER_WINS) != last.item(_PLAYER_WINS)
+                totals["losses"] += current.item(_ENEMY_WINS) != last.item(_ENEMY_WINS)
+                totals["health_differential"] += last.item(_PLAYER_HEALTH) - last.item(_ENEMY_HEALTH)
+                break
+            if current.item(_GAME_STATE_FLAG) != agent.GAME_STATE_COMBAT:
+                # Combat ended without a decided round; finish the round after the dialogue.
+                wait_for_combat(pyboy, game, start_state)
+                current = game.read_state_array()
+            last = current
+        else:
+            totals["timeouts"] += 1
+            start_state.restore()
+        totals["rounds"] += 1
+        totals["decisions"] += step
+        totals["frames"] += step * frames_per_step
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+def merge_results(parts):
+    """
+    Combine per-worker totals into the evaluation summary.
+
+    Args:
+        parts: Dicts returned by play_rounds
+
+    Returns:
+        dict: rounds, wins, losses, timeouts, win_rate, mean_health_differential,
+            frames_per_round and decisions_per_second summed over the workers
+    """
+    totals = {key: sum(part[key] for part in parts) for key in parts[0]}
+    rounds = max(totals["rounds"], 1)
+    return {
+        "rounds": totals["rounds"],
+        "wins": totals["wins"],
+        "losses": totals["losses"],
+        "timeouts": totals["timeouts"],
+        "win_rate": totals["wins"] / rounds,
+        "mean_health_differential": totals["health_differential"] / rounds,
+        "frames_per_round": totals["frames"] / rounds,
+        "decisions_per_second": sum(part["decisions"] / part["seconds"] for part in parts if part["seconds"]),
+    }
+
+
+class Evaluator:
+    """
+    Greedy-policy evaluation on an EmulatorPool.
+
+    `submit` starts an evaluation of a Q-table copy and returns at once,
+    so training can keep going; `poll` returns the summaries of the
+    evaluations that have finished since the last call. The pool can be
+    shared with other drivers.
+    """
+
+    def __init__(self, pool, rounds, seed=0, discretizer_config=None, executor=None):
+        self.pool = pool
+        self.rounds = rounds
+        self.seed = seed
+        self.discretizer_config = discretizer_config
+        self.executor = executor
+        self.pending = []
+
+    def submit(self, q_values, label=None):
+        """Start evaluating `q_values`, split into one job per pool worker."""
+        q_values = q_values.copy()
+        jobs = self.pool.num_workers
+        shares = [self.rounds // jobs + (job < self.rounds % jobs) for job in range(jobs)]
+        futures = [self.pool.submit(play_rounds, q_values, share, self.seed + job,
+                                    self.discretizer_config, self.executor)
+                   for job, share in enumerate(shares) if share]
+        self.pending.append((label, futures))
+
+    def poll(self, wait=False):
+        """
+        Collect finished evaluations.
+
+        Args:
+            wait: Block until every pending evaluation has finished
+
+        Returns:
+            list: (label, summary) for each finished evaluation
+        """
+        finished = []
+        still_pending = []
+        for label, futures in self.pending:
+            if wait or all(future.done() for future in futures):
+                try:
+                    parts = [future.result() for future in futures]
+                    finished.append((label, merge_results(parts)))
+                except Exception as e:
+                    print(f"Warning: Evaluation {label} failed: {e}")
+            else:
+                still_pending.append((label, futures))
+        self.pending = still_pending
+        return finished
+
+    def evaluate(self, q_values):
+        """Evaluate `q_values` and wait for the summary."""
+        self.submit(q_values)
+        results = self.poll(wait=True)
+        return results[-1][1] if results else None
+
+
+def format_summary(summary):
+    """One-line human-readable form of an evaluation summary."""
+    return (f"{summary['rounds']} rounds: win rate {summary['win_rate']:.3f} "
+            f"({summary['wins']}W/{summary['losses']}L/{summary['timeouts']} timeouts), "
+            f"health diff {summary['mean_health_differential']:.0f}, "
+            f"{summary['frames_per_round']:.0f} frames/round, "
+            f"{summary['decisions_per_second']:.0f} decisions/s")
+
+
+if __name__ == "__main__":
+    from checkpoint import Checkpointer
+
+    parser = argparse.ArgumentParser(description="Measure the greedy win rate of a saved Q-table.")
+    parser.add_argument("q_table", help="Q-table .npy file or checkpoint directory")
+    parser.add_argument("--rounds", type=int, default=100, help="rounds to play in total")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count(), help="emulator processes")
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the start jitter; worker i uses seed + i")
+    parser.add_argument("--discretizer-config", help="Discretizer JSON config the table was trained with")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(args.discretizer_config)
+
+    if os.path.isdir(args.q_table):
+        checkpoint = Checkpointer(args.q_table).load()
+        if checkpoint is None:
+            parser.error(f"No checkpoint in {args.q_table}")
+        q_table = checkpoint[0]
+    else:
+        q_table = DenseQTable.load(args.q_table)
+    if q_table.num_states != agent.DISCRETIZER.num_states:
+        parser.error(f"{args.q_table} has {q_table.num_states} states, the discretizer has "
+                     f"{agent.DISCRETIZER.num_states}")
+
+    with EmulatorPool(min(args.workers, args.rounds), args.rom) as pool:
+        summary = Evaluator(pool, args.rounds, args.seed, args.discretizer_config).evaluate(q_table.values)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
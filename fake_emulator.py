@@ -0,0 +1,171 @@
+import pickle
+import random
+
+import numpy as np
+
+from pyboy.utils import WindowEvent
+
+from pq_memory_map import MemoryField, MemoryMap
+
+# Game state flags written by the fake game (same values as agent.py).
+FLAG_DIALOGUE = 0xC2
+FLAG_COMBAT = 0xC3
+
+# Where the fake game keeps its fields. It is independent of the ROM's
+# pq_memory_map.json, so the fake emulator works whatever that map holds;
+# pass it to GameState along with the FakePyBoy.
+FAKE_MEMORY_MAP = MemoryMap([
+    MemoryField("player_health", 0xC100, 2),
+    MemoryField("enemy_health", 0xC102, 2),
+    MemoryField("player_wins", 0xC104),
+    MemoryField("enemy_wins", 0xC105),
+    MemoryField("player_x_position", 0xC106),
+    MemoryField("player_y_position", 0xC107),
+    MemoryField("enemy_x_position", 0xC108),
+    MemoryField("enemy_y_position", 0xC109),
+    MemoryField("game_state_flag", 0xC10A),
+], name="fake")
+
+FULL_HEALTH = 0x6000
+ROUND_TRANSITION_FRAMES = 90
+
+
+class FakeMemory:
+    """64 KiB of emulator memory. Slices read as lists, as with PyBoy."""
+
+    def __init__(self):
+        self.data = bytearray(0x10000)
+
+    def __getitem__(self, address):
+        if isinstance(address, slice):
+            return list(self.data[address])
+        return self.data[address]
+
+    def __setitem__(self, address, value):
+        self.data[address] = value
+
+
+class FakeScreen:
+    """Blank RGBA screen buffer with PyBoy's `screen.ndarray` shape."""
+
+    def __init__(self):
+        self.ndarray = np.zeros((144, 160, 4), dtype=np.uint8)
+
+
+class FakePyBoy:
+    """
+    Deterministic in-memory stand-in for PyBoy.
+
+    Exposes `memory`, `screen`, `tick`, `send_input`, `save_state`, `load_state` and
+    `stop`, and plays a crude fight: both fighters lose health at random,
+    held buttons move the player, and a round ends in a short dialogue
+    that has to be dismissed with A. The same seed always produces the
+    same memory contents for the same inputs.
+    """
+
+    def __init__(self, seed=0, memory_map=FAKE_MEMORY_MAP):
+        """
+        Args:
+            seed: Seed of the fight's randomness
+            memory_map: MemoryMap placing the fields the fake game writes
+        """
+        self.memory_map = memory_map
+        self._player_health = memory_map.field("player_health")
+        self._enemy_health = memory_map.field("enemy_health")
+        self._player_wins = memory_map.field("player_wins").address
+        self._enemy_wins = memory_map.field("enemy_wins").address
+        self._player_x = memory_map.field("player_x_position").address
+        self._enemy_x = memory_map.field("enemy_x_position").address
+        self._flag = memory_map.field("game_state_flag").address
+        self.memory = FakeMemory()
+        self.screen = FakeScreen()
+        self._rng = random.Random(seed)
+        self._held = set()
+        self._transition_frames = 0
+        self._write_word(self._player_health, FULL_HEALTH)
+        self._write_word(self._enemy_health, FULL_HEALTH)
+        self.memory[self._player_x] = 40
+        self.memory[self._enemy_x] = 120
+        self.memory[self._flag] = FLAG_COMBAT
+
+    def _write_word(self, field, value):
+        self.memory.data[field.byte_address(0)] = (value >> 8) & 0xFF
+        self.memory.data[field.byte_address(1)] = value & 0xFF
+
+    def _read_word(self, field):
+        return field.decode(self.memory.data)
+
+    def send_input(self, event):
+        if event in (WindowEvent.PRESS_ARROW_LEFT, WindowEvent.PRESS_ARROW_RIGHT,
+                     WindowEvent.PRESS_BUTTON_A, WindowEvent.PRESS_BUTTON_B):
+            self._held.add(event)
+        elif event == WindowEvent.RELEASE_ARROW_LEFT:
+            self._held.discard(WindowEvent.PRESS_ARROW_LEFT)
+        elif event == WindowEvent.RELEASE_ARROW_RIGHT:
+            self._held.discard(WindowEvent.PRESS_ARROW_RIGHT)
+        elif event == WindowEvent.RELEASE_BUTTON_A:
+            self._held.discard(WindowEvent.PRESS_BUTTON_A)
+        elif event == WindowEvent.RELEASE_BUTTON_B:
+            self._held.discard(WindowEvent.PRESS_BUTTON_B)
+
+    def tick(self, count=1, render=True, sound=True):
+        """
+        Advance `count` frames. Each frame is simulated on its own, so one
+        call of N frames plays exactly like N calls of one frame.
+        """
+        for _ in range(count):
+            self._frame()
+        return True
+
+    def _frame(self):
+        data = self.memory.data
+
+        if data[self._flag] != FLAG_COMBAT:
+            self._transition_frames -= 1
+            if self._transition_frames <= 0 and WindowEvent.PRESS_BUTTON_A in self._held:
+                data[self._flag] = FLAG_COMBAT
+            return
+
+        x = data[self._player_x]
+        if WindowEvent.PRESS_ARROW_LEFT in self._held:
+            x = max(0, x - 1)
+        if WindowEvent.PRESS_ARROW_RIGHT in self._held:
+            x = min(160, x + 1)
+        data[self._player_x] = x
+
+        attacking = WindowEvent.PRESS_BUTTON_A in self._held or WindowEvent.PRESS_BUTTON_B in self._held
+        close = abs(x - data[self._enemy_x]) < 40
+        if self._rng.random() < 0.05:
+            self._damage(self._player_health, self._enemy_wins)
+        if attacking and close and self._rng.random() < 0.1:
+            self._damage(self._enemy_health, self._player_wins)
+
+    def _damage(self, health_field, winner_address):
+        health = self._read_word(health_field) - self._rng.randint(0x200, 0x1000)
+        if health > 0:
+            self._write_word(health_field, health)
+            return
+        # Round over: the other fighter wins, health resets and a short dialogue plays.
+        data = self.memory.data
+        data[winner_address] = (data[winner_address] + 1) % 3
+        self._write_word(self._player_health, FULL_HEALTH)
+        self._write_word(self._enemy_health, FULL_HEALTH)
+        self.start_round_transition()
+
+    def start_round_transition(self):
+        """Enter the between-rounds dialogue, which A dismisses after ROUND_TRANSITION_FRAMES."""
+        self.memory.data[self._flag] = FLAG_DIALOGUE
+        self._transition_frames = ROUND_TRANSITION_FRAMES
+
+    def save_state(self, file_like_object):
+        file_like_object.write(bytes(self.memory.data))
+        pickle.dump((self._transition_frames, self._rng.getstate()), file_like_object)
+
+    def load_state(self, file_like_object):
+        self.memory.data[:] = file_like_object.read(0x10000)
+        self._transition_frames, rng_state = pickle.load(file_like_object)
+        self._rng.setstate(rng_state)
+        self._held.clear()
+
+    def stop(self, save=True):
+        pass
@@ -0,0 +1,63 @@
+import numpy as np
+
+from game_state import FIELD_INDEX, NUM_FIELDS
+
+_PLAYER_WINS = FIELD_INDEX["player_wins"]
+_ENEMY_WINS = FIELD_INDEX["enemy_wins"]
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+
+
+class FrameStats:
+    """
+    State arrays sampled on every frame of one action.
+
+    Reading state only after an action misses what happens while the
+    button is held: a hit followed by a round reset, a round decided and
+    the next one started, or combat left and re-entered. Pass `sample` as
+    the `on_frame` hook of ActionExecutor.execute and each frame's state
+    is decoded with one bulk read into a preallocated window, whose first
+    row is the state before the action. Once the action is done, the
+    reward (RewardEngine.compute_window) and the episode end
+    (`round_decided`, `left_combat`) are computed from the whole window.
+    """
+
+    def __init__(self, game, max_frames):
+        """
+        Args:
+            game: GameState to read from
+            max_frames: Frames per action, e.g. ActionExecutor.frames_per_action
+        """
+        self.game = game
+        self.states = np.zeros((max_frames + 1, NUM_FIELDS), dtype=np.int32)
+        self.count = 0
+
+    def begin(self, last_state):
+        """Start a window at `last_state`, the state before the action."""
+        self.states[0] = last_state
+        self.count = 1
+
+    def sample(self):
+        """Read the current frame's state into the window. If the window is full the last row is overwritten."""
+        row = min(self.count, len(self.states) - 1)
+        self.game.read_state_array(self.states[row])
+        self.count = row + 1
+
+    @property
+    def window(self):
+        """(frames + 1, NUM_FIELDS) view: the state before the action, then one row per frame."""
+        return self.states[:self.count]
+
+    @property
+    def current(self):
+        """State after the last sampled frame. A view; copy it to keep it past the next `begin`."""
+        return self.states[self.count - 1]
+
+    def round_decided(self):
+        """True if either round counter changed on any frame of the window."""
+        window = self.window
+        return bool((window[:, _PLAYER_WINS] != window.item(0, _PLAYER_WINS)).any()
+                    or (window[:, _ENEMY_WINS] != window.item(0, _ENEMY_WINS)).any())
+
+    def left_combat(self, combat_flag):
+        """True if game_state_flag was anything but `combat_flag` on any frame."""
+        return bool(np.any(self.window[1:, _GAME_STATE_FLAG] != combat_flag))
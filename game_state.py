@@ -1,149 +1,136 @@
+import numpy as np
 import pq_memory_map
 
+# State array layout: (field name, width in bytes). GameState decodes
+# these fields, in this order, with the read plan of the memory map,
+# which must give each field the same width.
+SNAPSHOT_FIELDS = (
+    ("player_health", 2),
+    ("enemy_health", 2),
+    ("player_wins", 1),
+    ("enemy_wins", 1),
+    ("player_x_position", 1),
+    ("player_y_position", 1),
+    ("enemy_x_position", 1),
+    ("enemy_y_position", 1),
+    ("game_state_flag", 1),
+)
+
+FIELD_NAMES = tuple(name for name, _ in SNAPSHOT_FIELDS)
+FIELD_INDEX = {name: index for index, name in enumerate(FIELD_NAMES)}
+NUM_FIELDS = len(FIELD_NAMES)
+
+def round_decided(state, last_state):
+    """True if either fighter's round count changed between two state arrays."""
+    return (state.item(FIELD_INDEX["player_wins"]) != last_state.item(FIELD_INDEX["player_wins"])
+            or state.item(FIELD_INDEX["enemy_wins"]) != last_state.item(FIELD_INDEX["enemy_wins"]))
+
+
 class GameState:
     """
     A class to manage reading and interpreting the game's state from memory.
     This acts as a live interface to the emulator's memory.
     """
 
-    def __init__(self, pyboy):
+    def __init__(self, pyboy, memory_map=None):
+        """
+        Args:
+            pyboy: PyBoy instance
+            memory_map: pq_memory_map.MemoryMap (default: the map loaded by pq_memory_map.load)
+        """
         self.pyboy = pyboy
+        self.memory_map = memory_map if memory_map is not None else pq_memory_map.load()
+        for name, width in SNAPSHOT_FIELDS:
+            if self.memory_map.field(name).width != width:
+                raise ValueError(f"Memory map field '{name}' has width {self.memory_map.field(name).width}, "
+                                 f"the state layout expects {width}")
+        self.plan = self.memory_map.read_plan(FIELD_NAMES)
         self._validate_memory_access()
 
     def _validate_memory_access(self):
         """Validate that we can access the required memory addresses."""
         try:
-            # Test a few key memory addresses
-            _ = self.pyboy.memory[pq_memory_map.GAME_STATE_FLAG]
-            _ = self.pyboy.memory[pq_memory_map.PLAYER_HEALTH_HI]
-            _ = self.pyboy.memory[pq_memory_map.ENEMY_HEALTH_HI]
+            # Read every range of the plan once
+            self.plan.read(self.pyboy.memory, np.empty(NUM_FIELDS, dtype=np.int32))
         except Exception as e:
             raise ValueError(f"Cannot access required memory addresses: {e}")
 
-    def _safe_memory_read(self, address, default=0):
-        """Safely read from memory with error handling."""
+    def _safe_field_read(self, name, default=0):
+        """Safely read one field from memory with error handling."""
         try:
-            return self.pyboy.memory[address]
+            return self.memory_map.field(name).decode(self.pyboy.memory)
         except Exception as e:
-            print(f"Warning: Cannot read memory address 0x{address:04X}: {e}")
+            print(f"Warning: Cannot read field {name}: {e}")
             return default
 
+    def read_state_array(self, out=None):
+        """
+        Read every snapshot field with the memory map's read plan, normally a single memory access.
+
+        Args:
+            out: Optional int32 array of length NUM_FIELDS to decode into
+
+        Returns:
+            np.ndarray: Field values in FIELD_NAMES order
+        """
+        if out is None:
+            out = np.empty(NUM_FIELDS, dtype=np.int32)
+        try:
+            return self.plan.read(self.pyboy.memory, out)
+        except Exception as e:
+            print(f"Warning: Cannot read memory ranges {self.plan.ranges}: {e}")
+            out.fill(0)
+            return out
+
     @property
     def player_health(self):
         """This property reads the two health bytes and combines them into a single value."""
-        try:
-            hi = self._safe_memory_read(pq_memory_map.PLAYER_HEALTH_HI)
-            lo = self._safe_memory_read(pq_memory_map.PLAYER_HEALTH_LO)
-            return (hi << 8) + lo
-        except Exception as e:
-            print(f"Error reading player health: {e}")
-            return 0
- 
+        return self._safe_field_read("player_health")
+
     @property
     def enemy_health(self):
         """This property reads the two health bytes and combines them into a single value."""
-        try:
-            hi = self._safe_memory_read(pq_memory_map.ENEMY_HEALTH_HI)
-            lo = self._safe_memory_read(pq_memory_map.ENEMY_HEALTH_LO)
-            return (hi << 8) + lo
-        except Exception as e:
-            print(f"Error reading enemy health: {e}")
-            return 0
+        return self._safe_field_read("enemy_health")
 
     @property
     def player_wins(self):
         """This property reads the rounds won for player."""
-        return self._safe_memory_read(pq_memory_map.PLAYER_WINS_ROUND)
+        return self._safe_field_read("player_wins")
 
     @property
     def enemy_wins(self):
         """This property reads the rounds won for enemy."""
-        return self._safe_memory_read(pq_memory_map.ENEMY_WINS_ROUND)
+        return self._safe_field_read("enemy_wins")
 
     @property
     def player_x_position(self):
         """This property reads player X position in a fight."""
-        return self._safe_memory_read(pq_memory_map.PLAYER_X_POSITION_HI)
+        return self._safe_field_read("player_x_position")
 
     @property
     def player_y_position(self):
         """This property reads player Y position in a fight."""
-        return self._safe_memory_read(pq_memory_map.PLAYER_Y_POSITION_HI)
+        return self._safe_field_read("player_y_position")
 
     @property
     def enemy_x_position(self):
         """This property reads enemy X position in a fight."""
-        return self._safe_memory_read(pq_memory_map.ENEMY_X_POSITION_HI)
+        return self._safe_field_read("enemy_x_position")
 
     @property
     def enemy_y_position(self):
         """This property reads enemy Y position in a fight."""
-        return self._safe_memory_read(pq_memory_map.ENEMY_Y_POSITION_HI)
+        return self._safe_field_read("enemy_y_position")
 
     @property
     def game_state_flag(self):
         """Get the current game state flag."""
-        return self._safe_memory_read(pq_memory_map.GAME_STATE_FLAG)
-
-    def get_discretized_state(self):
-        """
-        Takes continuous values and puts them into discrete buckets for the Q-Table.
-        """
-        try:
-            if self.player_health > 18000: 
-                player_health_bucket = "High"
-            elif self.player_health > 6000: 
-                player_health_bucket = "Medium"
-            else: 
-                player_health_bucket = "Low"
-
-            if self.enemy_health > 18000: 
-                enemy_health_bucket = "High"
-            elif self.enemy_health > 6000: 
-                enemy_health_bucket = "Medium"
-            else: 
-                enemy_health_bucket = "Low"
-
-            distance = abs(self.player_x_position - self.enemy_x_position)
-            if distance < 40: 
-                distance_bucket = "Close"
-            elif distance < 80: 
-                distance_bucket = "Mid"
-            else: 
-                distance_bucket = "Far"
-
-            return (player_health_bucket, enemy_health_bucket, distance_bucket)
-        except Exception as e:
-            print(f"Error discretizing state: {e}")
-            return ("Low", "Low", "Far")  # Default safe state
+        return self._safe_field_read("game_state_flag")
 
     def get_state_snapshot(self):
         """
         Takes a snapshot of the current game state and returns it as a dictionary.
         This is useful for saving a state in time to compare against later.
+        All fields come from the read plan's bulk memory read.
         """
-        try:
-            return {
-                "player_health": self.player_health,
-                "enemy_health": self.enemy_health,
-                "player_wins": self.player_wins,
-                "enemy_wins": self.enemy_wins,
-                "player_x_position": self.player_x_position,
-                "player_y_position": self.player_y_position,
-                "enemy_x_position": self.enemy_x_position,
-                "enemy_y_position": self.enemy_y_position,
-                "game_state_flag": self.game_state_flag
-            }
-        except Exception as e:
-            print(f"Error getting state snapshot: {e}")
-            return {
-                "player_health": 0,
-                "enemy_health": 0,
-                "player_wins": 0,
-                "enemy_wins": 0,
-                "player_x_position": 0,
-                "player_y_position": 0,
-                "enemy_x_position": 0,
-                "enemy_y_position": 0,
-                "game_state_flag": 0
-            }
+        return dict(zip(FIELD_NAMES, self.read_state_array().tolist()))
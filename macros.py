@@ -0,0 +1,134 @@
+import hashlib
+
+from actions import BUTTON_EVENTS
+from emulator import advance
+from memory_watch import advance_until_equals
+
+# Menu navigation waits, in frames.
+MENU_WAIT_BOOT = 600
+MENU_WAIT_LOAD = 180
+MENU_WAIT_START = 120
+MENU_WAIT_SHORT = 20
+MENU_PRESS_FRAMES = 5
+
+# Compiled schedule opcodes.
+OP_INPUT = 0
+OP_ADVANCE = 1
+OP_WAIT_UNTIL = 2
+
+
+def press(button, frames=MENU_PRESS_FRAMES):
+    """Macro step: hold `button` for `frames` frames, then release it."""
+    return ("press", button, frames)
+
+
+def wait(frames):
+    """Macro step: advance `frames` frames with nothing pressed."""
+    return ("wait", frames)
+
+
+def wait_until(address, value, max_frames):
+    """Macro step: advance until the byte at `address` equals `value`, at most `max_frames` frames."""
+    return ("wait_until", address, value, max_frames)
+
+
+def compile_macro(steps):
+    """
+    Compile macro steps into a flat schedule of (opcode, ...) tuples.
+    Consecutive frame advances are merged into one tick call.
+    """
+    schedule = []
+
+    def add_advance(frames):
+        if frames <= 0:
+            return
+        if schedule and schedule[-1][0] == OP_ADVANCE:
+            schedule[-1] = (OP_ADVANCE, schedule[-1][1] + frames)
+        else:
+            schedule.append((OP_ADVANCE, frames))
+
+    for step in steps:
+        kind = step[0]
+        if kind == "press":
+            _, button, frames = step
+            press_event, release_event = BUTTON_EVENTS[button]
+            schedule.append((OP_INPUT, press_event))
+            add_advance(frames)
+            schedule.append((OP_INPUT, release_event))
+        elif kind == "wait":
+            add_advance(step[1])
+        elif kind == "wait_until":
+            _, address, value, max_frames = step
+            schedule.append((OP_WAIT_UNTIL, address, value, max_frames))
+        else:
+            raise ValueError(f"Unknown macro step '{kind}'")
+    return tuple(schedule)
+
+
+class InputMacro:
+    """
+    A declarative input script compiled once into a flat schedule.
+
+    The schedule digest identifies the macro, so StartStateCache can key
+    the save state reached after running it.
+    """
+
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = tuple(steps)
+        self.schedule = compile_macro(self.steps)
+
+    def digest(self):
+        """SHA-1 of the compiled schedule."""
+        return hashlib.sha1(repr((self.name, self.schedule)).encode()).hexdigest()
+
+    @property
+    def max_frames(self):
+        """Frames the macro advances if every wait_until runs to its limit."""
+        return sum(op[1] if op[0] == OP_ADVANCE else op[3] for op in self.schedule if op[0] != OP_INPUT)
+
+    def run(self, pyboy):
+        """
+        Execute the schedule.
+
+        Returns:
+            int: Frames advanced
+        """
+        frames = 0
+        for op in self.schedule:
+            code = op[0]
+            if code == OP_ADVANCE:
+                advance(pyboy, op[1])
+                frames += op[1]
+            elif code == OP_INPUT:
+                pyboy.send_input(op[1])
+            else:
+                waited, met = advance_until_equals(pyboy, op[1], op[2], op[3])
+                frames += waited
+                if not met:
+                    print(f"Warning: Macro '{self.name}' timed out waiting for 0x{op[1]:04X} == 0x{op[2]:02X}")
+        return frames
+
+
+# Select English, then start the single player game. The waits are fixed
+# frame counts because the game state flag address is not confirmed yet
+# (see pq_memory_map.json); once it is, wait_until steps on the flag can
+# replace the long ones.
+MENU_MACRO = InputMacro("single_player", [
+    wait(MENU_WAIT_BOOT),
+    press("right"),
+    wait(MENU_WAIT_SHORT),
+    press("down"),
+    wait(MENU_WAIT_SHORT),
+    press("a"),
+    wait(MENU_WAIT_LOAD),
+    press("down"),
+    wait(MENU_WAIT_SHORT),
+    press("down"),
+    wait(MENU_WAIT_SHORT),
+    press("a"),
+    wait(MENU_WAIT_SHORT),
+    press("a"),
+    wait(MENU_WAIT_START),
+    press("a"),
+])
@@ -1,346 +1,160 @@
 # Imports
-import numpy as np
-import pq_memory_map as memory_map
+import argparse
 import random
-from pyboy import PyBoy
-from pyboy.utils import WindowEvent
+import agent
+from actions import DEFAULT_HOLD_FRAMES
+from checkpoint import Checkpointer
+from emulator import advance, create_emulator
+from discretizer import Discretizer
+from evaluate import Evaluator, format_summary
+from frame_stats import FrameStats
 from game_state import GameState
-
-# Q-Learning Constants (moved to global scope)
-LEARNING_RATE = 0.1
-DISCOUNT_FACTOR = 0.9
-EPSILON_DECAY = 0.9999
-MIN_EPSILON = 0.01
-
-# Action Space
-ACTION_DO_NOTHING = 0
-ACTION_MOVE_LEFT = 1
-ACTION_MOVE_RIGHT = 2
-ACTION_JUMP = 3
-ACTION_CROUCH = 4
-ACTION_STRONG = 5
-ACTION_LIGHT = 6
-
-ACTION_SPACE = [
-    ACTION_DO_NOTHING,
-    ACTION_MOVE_LEFT,
-    ACTION_MOVE_RIGHT,
-    ACTION_JUMP,
-    ACTION_CROUCH,
-    ACTION_STRONG,
-    ACTION_LIGHT
-]
-
-# Menu navigation constants
-MENU_WAIT_LONG = 600
-MENU_WAIT_MEDIUM = 180
-MENU_WAIT_SHORT = 20
-MENU_WAIT_TINY = 5
-
-# Game state constants for better readability
-GAME_STATE_MENU = 0xC0
-GAME_STATE_HOME = 0xC1
-GAME_STATE_DIALOGUE = 0xC2
-GAME_STATE_COMBAT = 0xC3
-
-def get_game_state_name(state_flag):
-    """Convert game state flag to human-readable name."""
-    state_names = {
-        GAME_STATE_MENU: "Menu",
-        GAME_STATE_HOME: "Home",
-        GAME_STATE_DIALOGUE: "Dialogue",
-        GAME_STATE_COMBAT: "Combat"
-    }
-    return state_names.get(state_flag, f"Unknown(0x{state_flag:02X})")
-
-
-# Navigates initial menus to select English then 
-# start the single player game.
-def navigate_to_gameplay(pyboy):
-    """
-    This function will select the correct language and 
-    start the game.
-    """
-    print("Making menu selections.")
-
-    for _ in range(MENU_WAIT_LONG):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_ARROW_RIGHT)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_RIGHT)
-
-    for _ in range(MENU_WAIT_SHORT):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_ARROW_DOWN)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_DOWN)
-
-    for _ in range(MENU_WAIT_SHORT):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-
-    for _ in range(MENU_WAIT_MEDIUM):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_ARROW_DOWN)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_DOWN)
-    for _ in range(MENU_WAIT_SHORT):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.PRESS_ARROW_DOWN)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_DOWN)
-
-
-    for _ in range(MENU_WAIT_SHORT):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-    for _ in range(MENU_WAIT_SHORT):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-    for _ in range(120):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(MENU_WAIT_TINY):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-
-def calculate_reward_delta(state_key, current_game_state, last_game_state, positive_reward, negative_reward):
-    """
-    A generic function to calculate reward based on the change in a single state variable.
-    
-    Args:
-        current_state (dict): The current snapshot of the game state.
-        last_state (dict): The game state from the previous frame.
-        state_key (str): The dictionary key for the state variable to check (e.g., "player_health").
-        positive_reward (float): The reward to give for each point of positive change.
-        negative_reward (float): The penalty to give for each point of negative change.
-        
-    Returns:
-        float: The calculated reward or penalty.
-    """
-    try:
-        delta = current_game_state[state_key] - last_game_state[state_key]
-
-        if delta > 0:
-            return positive_reward * delta
-        elif delta < 0:
-            return negative_reward * abs(delta)
-
-        return 0
-    except KeyError:
-        print(f"Warning: State key '{state_key}' not found in game state")
-        return 0
-
-
-def calculate_reward(current_game_state, last_game_state):
-    """Calculate reward based on delta between states."""
-    try:
-        total_reward = -0.01
-
-        total_reward += calculate_reward_delta("enemy_health", current_game_state, last_game_state, 0, 1)
-        total_reward += calculate_reward_delta("player_health", current_game_state, last_game_state, 0, -1)
-        total_reward += calculate_reward_delta("player_wins", current_game_state, last_game_state, 500, 0)
-        total_reward += calculate_reward_delta("enemy_wins", current_game_state, last_game_state, 0, -500)
-        
-        if total_reward != -0.01:
-            print(f"Reward this tick: {total_reward}")
-        return total_reward
-    except Exception as e:
-        print(f"Error calculating reward: {e}")
-        return -0.01
-
-
-def game_state_fight(pyboy, game, q_table, last_game_state, discretized_last_game_state, epsilon):
-    """
-    Handle the fighting game state using Q-learning.
-    
-    Args:
-        pyboy: PyBoy instance
-        game: GameState instance
-        q_table: Q-learning table
-        last_game_state: Previous game state
-        discretized_last_game_state: Previous discretized state
-        epsilon: Exploration rate
-        
-    Returns:
-        tuple: Updated q_table, current_game_state, discretized_current_game_state, epsilon
-    """
-    try:
-        # Epsilon-greedy action selection
-        if random.uniform(0, 1) < epsilon:
-            action = random.choice(ACTION_SPACE)
-        else:
-            action = np.argmax(q_table[discretized_last_game_state])
-
-        # Execute action
-        if action == ACTION_DO_NOTHING:
-            for _ in range(10):
-                pyboy.tick()
-        elif action == ACTION_MOVE_LEFT:
-            pyboy.send_input(WindowEvent.PRESS_ARROW_LEFT)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_ARROW_LEFT)
-        elif action == ACTION_MOVE_RIGHT:
-            pyboy.send_input(WindowEvent.PRESS_ARROW_RIGHT)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_ARROW_RIGHT)
-        elif action == ACTION_CROUCH:
-            pyboy.send_input(WindowEvent.PRESS_ARROW_DOWN)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_ARROW_DOWN)
-        elif action == ACTION_JUMP:
-            pyboy.send_input(WindowEvent.PRESS_ARROW_UP)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_ARROW_UP)
-        elif action == ACTION_STRONG:
-            pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-        elif action == ACTION_LIGHT:
-            pyboy.send_input(WindowEvent.PRESS_BUTTON_B)
-            for _ in range(10):
-                pyboy.tick()
-            pyboy.send_input(WindowEvent.RELEASE_BUTTON_B)
-
-        # Get current state and calculate reward
-        current_game_state = game.get_state_snapshot()
-        reward = calculate_reward(current_game_state, last_game_state)
-        discretized_current_game_state = game.get_discretized_state()
-
-        # Initialize Q-table entry if needed
-        if discretized_current_game_state not in q_table:
-            q_table[discretized_current_game_state] = np.zeros(len(ACTION_SPACE))
-
-        # Q-learning update
-        old_value = q_table[discretized_last_game_state][action]
-        next_max = np.max(q_table[discretized_current_game_state])
-
-        new_value = old_value + LEARNING_RATE * (reward + DISCOUNT_FACTOR * next_max - old_value)
-        q_table[discretized_last_game_state][action] = new_value
-
-        # Update epsilon
-        if epsilon > MIN_EPSILON:
-            epsilon *= EPSILON_DECAY
-        
-        return q_table, current_game_state, discretized_current_game_state, epsilon
-        
-    except Exception as e:
-        print(f"Error in game_state_fight: {e}")
-        return q_table, last_game_state, discretized_last_game_state, epsilon
-
-
-def handle_dialogue(pyboy, game, dialogue_timeout=50):
-    """
-    Handle dialogue encounters more intelligently.
-    
-    Args:
-        pyboy: PyBoy instance
-        game: GameState instance
-        dialogue_timeout: Maximum number of ticks to spend in dialogue
-        
-    Returns:
-        bool: True if dialogue was handled successfully, False if timeout
-    """
-    print(f"Handling dialogue encounter...")
-    
-    # Try different dialogue handling strategies
-    strategies = [
-        # Strategy 1: Press A with short delays
-        lambda: (pyboy.send_input(WindowEvent.PRESS_BUTTON_A), 
-                [pyboy.tick() for _ in range(3)],
-                pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)),
-        
-        # Strategy 2: Press A with longer delays
-        lambda: (pyboy.send_input(WindowEvent.PRESS_BUTTON_A),
-                [pyboy.tick() for _ in range(10)],
-                pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)),
-        
-        # Strategy 3: Press B instead of A
-        lambda: (pyboy.send_input(WindowEvent.PRESS_BUTTON_B),
-                [pyboy.tick() for _ in range(5)],
-                pyboy.send_input(WindowEvent.RELEASE_BUTTON_B)),
-        
-        # Strategy 4: Press Start
-        lambda: (pyboy.send_input(WindowEvent.PRESS_BUTTON_START),
-                [pyboy.tick() for _ in range(5)],
-                pyboy.send_input(WindowEvent.RELEASE_BUTTON_START)),
-    ]
-    
-    ticks_in_dialogue = 0
-    strategy_index = 0
-    consecutive_same_state = 0
-    last_state = None
-    
-    while ticks_in_dialogue < dialogue_timeout:
-        current_state = game.game_state_flag
-        
-        # Check if we're still in dialogue
-        if current_state in [GAME_STATE_MENU, GAME_STATE_HOME, GAME_STATE_DIALOGUE]:  # Dialogue states
-            if current_state == last_state:
-                consecutive_same_state += 1
-            else:
-                consecutive_same_state = 0
-                print(f"Dialogue state changed to: {get_game_state_name(current_state)}")
-            
-            # If we've been in the same state for too long, try a different strategy
-            if consecutive_same_state > 5 and strategy_index < len(strategies):
-                try:
-                    strategies[strategy_index]()
-                    print(f"Tried dialogue strategy {strategy_index + 1} (stuck in {get_game_state_name(current_state)})")
-                except Exception as e:
-                    print(f"Error with dialogue strategy {strategy_index + 1}: {e}")
-                
-                strategy_index += 1
-                consecutive_same_state = 0
-            else:
-                # Standard dialogue handling
-                pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-                for _ in range(5):
-                    pyboy.tick()
-                pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-            
-            last_state = current_state
-            ticks_in_dialogue += 10
-        else:
-            print(f"Dialogue resolved! New state: {get_game_state_name(current_state)}")
-            return True
-    
-    print(f"Dialogue timeout reached after {dialogue_timeout} ticks")
-    return False
-
-
-def main():
+from macros import MENU_MACRO
+from profiling import PHASE_DIALOGUE
+from q_table import DenseQTable
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from rewards import RewardEngine
+from rollouts import RolloutLog, episode_seed
+from start_state import StartStateCache
+from telemetry import (
+    ERROR,
+    EVENT_CHECKPOINT,
+    EVENT_DIALOGUE,
+    EVENT_ERROR,
+    EVENT_RESET,
+    INFO,
+    LEVEL_NAMES,
+    Telemetry,
+    WARNING,
+)
+from trajectory import TrajectoryRecorder
+from worker_pool import EmulatorPool
+
+
+def report_evaluations(results):
+    """Print the summaries returned by Evaluator.poll."""
+    for steps, summary in results:
+        print(f"Evaluation at step {steps}: {format_summary(summary)}")
+
+
+def parse_args(argv=None):
+    """Parse the command line options for a training run."""
+    parser = argparse.ArgumentParser(description="Train the PowerQuest Q-learning agent.")
+    parser.add_argument("--headless", action="store_true",
+                        help="train with no window, no rendering and unlimited emulation speed")
+    parser.add_argument("--hold-frames", type=int, default=DEFAULT_HOLD_FRAMES,
+                        help="frames each fight action holds its button")
+    parser.add_argument("--frame-skip", type=int, default=0,
+                        help="extra frames to advance after releasing the button")
+    parser.add_argument("--action-repeat", type=int, default=1,
+                        help="times each chosen action is repeated")
+    parser.add_argument("--frame-stats", action="store_true",
+                        help="sample state on every frame of an action and reward hits that happen mid-action")
+    parser.add_argument("--replay-size", type=int, default=0,
+                        help="experience replay capacity in transitions (0 disables replay)")
+    parser.add_argument("--replay-batch", type=int, default=32,
+                        help="replayed transitions learned from per step")
+    parser.add_argument("--prioritized", action="store_true",
+                        help="sample replay transitions by TD error")
+    parser.add_argument("--reward-config",
+                        help="JSON file with reward terms (see rewards.RewardEngine.from_config)")
+    parser.add_argument("--telemetry",
+                        help="binary file to record per-step events to (summarize with telemetry.py)")
+    parser.add_argument("--telemetry-sample", type=int, default=1,
+                        help="record one in every N fight steps")
+    parser.add_argument("--log-level", choices=sorted(LEVEL_NAMES), default="warning",
+                        help="lowest level of console messages to print")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each phase of the training step (SIGUSR1 toggles it at runtime)")
+    parser.add_argument("--profile-every", type=int, default=10000,
+                        help="print a profile summary every N fight steps while profiling")
+    parser.add_argument("--profile-export",
+                        help="write the profile as speedscope JSON to this file on exit")
+    parser.add_argument("--discretizer-config",
+                        help="JSON file with state features and bucket boundaries (see discretizer.Discretizer.from_config)")
+    parser.add_argument("--record",
+                        help="record fight transitions to this directory for trajectory.py")
+    parser.add_argument("--seed", type=int,
+                        help="seed for exploration; episode n explores with its own RNG derived from it")
+    parser.add_argument("--rollout-log",
+                        help="log each episode's start state, seed and actions to this directory for rollouts.py")
+    parser.add_argument("--eval-rounds", type=int, default=0,
+                        help="after every checkpoint, evaluate the greedy policy over this many rounds in the background "
+                             "(skipped while the previous evaluation is still running)")
+    parser.add_argument("--eval-workers", type=int, default=2,
+                        help="emulator processes used for background evaluation")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the latest checkpoint in --checkpoint-dir")
+    parser.add_argument("--checkpoint-dir", default="checkpoints",
+                        help="directory checkpoints are written to")
+    parser.add_argument("--checkpoint-every", type=int, default=5000,
+                        help="fight steps between checkpoints (0 disables checkpointing)")
+    return parser.parse_args(argv)
+
+
+def main(args=None):
     """Main function to run the PowerQuest AI agent."""
-    q_table = {}
+    if args is None:
+        args = parse_args()
+
+    agent.TELEMETRY = Telemetry(args.telemetry, print_level=LEVEL_NAMES[args.log_level],
+                                sample_every=args.telemetry_sample)
+    agent.PROFILER.enabled = args.profile
+    agent.PROFILER.summary_every = args.profile_every
+    agent.PROFILER.install_toggle_signal()
+
+    if args.record:
+        agent.RECORDER = TrajectoryRecorder(args.record)
+    if args.discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(args.discretizer_config)
+    if args.reward_config:
+        agent.REWARD_ENGINE = RewardEngine.from_config(args.reward_config)
+
+    agent.ACTION_EXECUTOR.hold_frames = args.hold_frames
+    agent.ACTION_EXECUTOR.frame_skip = args.frame_skip
+    agent.ACTION_EXECUTOR.action_repeat = args.action_repeat
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 31)
+    agent.TELEMETRY.log(INFO, f"Exploration seed: {seed}")
+    if args.rollout_log:
+        # The main loop advances one frame before every fight step.
+        agent.ROLLOUT_LOG = RolloutLog(args.rollout_log, agent.ACTION_EXECUTOR, gap_frames=1,
+                                       frame_stats=args.frame_stats)
+    episode = 0
+    episode_rng = None
+
+    q_table = DenseQTable(agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE))
     epsilon = 1.0
+    steps = 0
+    replay = None
+    if args.replay_size > 0:
+        replay = (PrioritizedReplayBuffer if args.prioritized else ReplayBuffer)(args.replay_size)
     consecutive_errors = 0
     max_consecutive_errors = 10
 
+    evaluator = None
+    if args.eval_rounds > 0 and args.checkpoint_every > 0:
+        evaluator = Evaluator(EmulatorPool(args.eval_workers, agent.ROM_PATH), args.eval_rounds,
+                              discretizer_config=args.discretizer_config, executor=agent.ACTION_EXECUTOR)
+
+    checkpointer = Checkpointer(args.checkpoint_dir) if args.checkpoint_every > 0 or args.resume else None
+    if args.resume:
+        try:
+            checkpoint = checkpointer.load()
+        except Exception as e:
+            print(f"Error loading checkpoint: {e}")
+            return
+        if checkpoint is None:
+            print(f"No checkpoint found in {args.checkpoint_dir}, starting fresh")
+        elif checkpoint[0].values.shape != q_table.values.shape:
+            print(f"Checkpoint Q-table shape {checkpoint[0].values.shape} does not match, starting fresh")
+        else:
+            q_table, epsilon, steps = checkpoint
+            print(f"Resumed from checkpoint at step {steps} (epsilon {epsilon:.4f})")
+
     # Attempt to open ROM.
     try:
-        pyboy = PyBoy('PowerQuest.gb')
+        pyboy = create_emulator(agent.ROM_PATH, headless=args.headless)
     except Exception as e:
         print(f"Error initializing PyBoy: {e}")
         return
@@ -352,59 +166,102 @@ def main():
         pyboy.stop()
         return
     
-    navigate_to_gameplay(pyboy)
+    if args.frame_stats:
+        agent.FRAME_STATS = FrameStats(game, agent.ACTION_EXECUTOR.frames_per_action)
+
+    start_state = StartStateCache(pyboy, agent.ROM_PATH, MENU_MACRO)
+    if not start_state.prepare():
+        print(f"Loaded start state from {start_state.path}")
     print("PyBoy initialized. Starting the game with the correct loop...")
     
-    last_game_state = game.get_state_snapshot()
-    discretized_last_game_state = game.get_discretized_state()
-
-    if discretized_last_game_state not in q_table:
-        q_table[discretized_last_game_state] = np.zeros(len(ACTION_SPACE))
+    last_game_state = game.read_state_array()
+    discretized_last_game_state = agent.DISCRETIZER.index(last_game_state)
 
     # Main game loop
-    while pyboy.tick() != WindowEvent.QUIT:
+    while advance(pyboy):
         try:
             current_state_flag = game.game_state_flag
-            state_name = get_game_state_name(current_state_flag)
-            print(f"Current game state: {state_name} (0x{current_state_flag:02X})")
             
-            if current_state_flag == GAME_STATE_COMBAT:  # Combat state
-                q_table, current_game_state, discretized_current_game_state, epsilon = game_state_fight(
-                    pyboy, game, q_table, last_game_state, discretized_last_game_state, epsilon
+            if current_state_flag == agent.GAME_STATE_COMBAT:  # Combat state
+                if episode_rng is None:
+                    episode_rng = random.Random(episode_seed(seed, episode))
+                    if agent.ROLLOUT_LOG is not None:
+                        agent.ROLLOUT_LOG.begin(pyboy, episode_seed(seed, episode), last_game_state)
+                q_table, current_game_state, discretized_current_game_state, epsilon = agent.game_state_fight(
+                    pyboy, game, q_table, last_game_state, discretized_last_game_state, epsilon,
+                    replay, args.replay_batch, episode_rng
                 )
                 last_game_state = current_game_state
                 discretized_last_game_state = discretized_current_game_state
                 consecutive_errors = 0  # Reset error counter on successful combat
+
+                steps += 1
+                if args.checkpoint_every > 0 and steps % args.checkpoint_every == 0:
+                    checkpointer.save(q_table, epsilon, steps)
+                    agent.TELEMETRY.record(EVENT_CHECKPOINT, INFO, epsilon=epsilon)
+                    if evaluator is not None:
+                        report_evaluations(evaluator.poll())
+                        # Each pending evaluation holds a Q-table copy, so never queue a second one.
+                        if evaluator.pending:
+                            agent.TELEMETRY.log(INFO, f"Skipping evaluation at step {steps}, "
+                                                      f"the previous one is still running")
+                        else:
+                            evaluator.submit(q_table.values, steps)
             else:
+                if episode_rng is not None:
+                    # Combat was left, so the episode is over.
+                    episode_rng = None
+                    episode += 1
+                    if agent.ROLLOUT_LOG is not None:
+                        agent.ROLLOUT_LOG.end()
                 # Handle dialogue more intelligently
-                dialogue_success = handle_dialogue(pyboy, game)
+                agent.TELEMETRY.record(EVENT_DIALOGUE, INFO, current_state_flag)
+                start = agent.PROFILER.start()
+                dialogue_success = agent.handle_dialogue(pyboy, game)
+                agent.PROFILER.stop(PHASE_DIALOGUE, start)
                 if dialogue_success:
-                    last_game_state = game.get_state_snapshot()
-                    discretized_last_game_state = game.get_discretized_state()
+                    last_game_state = game.read_state_array()
+                    discretized_last_game_state = agent.DISCRETIZER.index(last_game_state)
                     consecutive_errors = 0  # Reset error counter on successful dialogue
                 else:
                     consecutive_errors += 1
-                    print(f"Dialogue handling failed (error #{consecutive_errors})")
+                    agent.TELEMETRY.record(EVENT_ERROR, WARNING, current_state_flag)
+                    agent.TELEMETRY.log(WARNING, f"Dialogue handling failed (error #{consecutive_errors})")
                     
                     # If we have too many consecutive errors, try to reset
                     if consecutive_errors >= max_consecutive_errors:
-                        print("Too many consecutive errors, attempting game reset...")
-                        # Try to reset by pressing Start multiple times
-                        for _ in range(3):
-                            pyboy.send_input(WindowEvent.PRESS_BUTTON_START)
-                            for _ in range(10):
-                                pyboy.tick()
-                            pyboy.send_input(WindowEvent.RELEASE_BUTTON_START)
+                        agent.TELEMETRY.log(WARNING, "Too many consecutive errors, restoring start state...")
+                        agent.TELEMETRY.record(EVENT_RESET, WARNING)
+                        start_state.restore()
+                        last_game_state = game.read_state_array()
+                        discretized_last_game_state = agent.DISCRETIZER.index(last_game_state)
                         consecutive_errors = 0
                     
         except Exception as e:
             consecutive_errors += 1
-            print(f"Error in main loop: {e}")
+            agent.TELEMETRY.record(EVENT_ERROR, ERROR)
+            agent.TELEMETRY.log(ERROR, f"Error in main loop: {e}")
             if consecutive_errors >= max_consecutive_errors:
-                print("Too many errors, stopping execution")
+                agent.TELEMETRY.log(ERROR, "Too many errors, stopping execution")
                 break
-            
+
+    if args.checkpoint_every > 0 and checkpointer.save(q_table, epsilon, steps):
+        print(f"Saved checkpoint at step {steps} to {args.checkpoint_dir}")
     pyboy.stop()
+    if evaluator is not None:
+        report_evaluations(evaluator.poll(wait=True))
+        evaluator.pool.close()
+    agent.TELEMETRY.close()
+    if agent.RECORDER is not None:
+        agent.RECORDER.close()
+        print(f"Recorded {agent.RECORDER.transitions_written} transitions to {args.record}")
+    if agent.ROLLOUT_LOG is not None:
+        agent.ROLLOUT_LOG.close()
+        print(f"Logged {agent.ROLLOUT_LOG.episodes_written} episodes to {args.rollout_log}")
+    if agent.PROFILER.steps:
+        print(agent.PROFILER.summary())
+        if args.profile_export:
+            agent.PROFILER.export_speedscope(args.profile_export)
     print("Game window closed. Script finished.")
 
 
@@ -0,0 +1,69 @@
+from actions import BUTTON_EVENTS
+from emulator import advance
+
+
+def advance_until(pyboy, address, condition, max_frames, step=1):
+    """
+    Advance the emulator until `condition` holds for the byte at `address`.
+
+    The byte is checked before advancing and then every `step` frames, so
+    the wait ends within `step` frames of the condition becoming true.
+
+    Args:
+        pyboy: PyBoy instance
+        address: Memory address to watch
+        condition: Function of the byte value returning True when done
+        max_frames: Give up after advancing this many frames
+        step: Frames advanced between checks
+
+    Returns:
+        tuple: (frames advanced, True if the condition was met)
+    """
+    if condition(pyboy.memory[address]):
+        return 0, True
+    frames = 0
+    while frames < max_frames:
+        count = min(step, max_frames - frames)
+        advance(pyboy, count)
+        frames += count
+        if condition(pyboy.memory[address]):
+            return frames, True
+    return frames, False
+
+
+def advance_until_equals(pyboy, address, value, max_frames, step=1):
+    """Advance until the byte at `address` equals `value`."""
+    return advance_until(pyboy, address, lambda current: current == value, max_frames, step)
+
+
+def tap_until_changes(pyboy, button, hold_frames, address, max_wait):
+    """
+    Tap `button` and wait for the byte at `address` to differ from its
+    value before the press.
+
+    The byte is checked on every frame of the hold too, so a change the
+    press causes at once is not missed; the button is then released early.
+
+    Args:
+        pyboy: PyBoy instance
+        button: Key of actions.BUTTON_EVENTS
+        hold_frames: Frames to hold the button at most
+        address: Memory address to watch
+        max_wait: Frames to wait after the release at most
+
+    Returns:
+        tuple: (frames advanced, True if the byte changed)
+    """
+    initial = pyboy.memory[address]
+
+    def changes(current):
+        return current != initial
+
+    press, release = BUTTON_EVENTS[button]
+    pyboy.send_input(press)
+    held, changed = advance_until(pyboy, address, changes, hold_frames)
+    pyboy.send_input(release)
+    if changed:
+        return held, True
+    waited, changed = advance_until(pyboy, address, changes, max_wait)
+    return held + waited, changed
@@ -0,0 +1,89 @@
+import numpy as np
+
+# Game Boy screen size in pixels.
+SCREEN_HEIGHT = 144
+SCREEN_WIDTH = 160
+
+# Default downsampled frame size and stack depth.
+DEFAULT_PIXEL_SIZE = (72, 80)
+DEFAULT_FRAME_STACK = 4
+
+# Integer luma weights (ITU-R BT.601, scaled to sum to 256).
+LUMA_WEIGHTS = (77, 150, 29)
+
+
+class FrameStack:
+    """
+    Grayscale, downsampled screen frames in a preallocated ring.
+
+    `push` reads PyBoy's screen ndarray, which is a view of the emulator's
+    frame buffer, so the screen is never copied whole. Downsampling is
+    nearest-neighbour: when the size divides the screen evenly the sampled
+    pixels are a strided view of the buffer, otherwise the sampled rows and
+    columns are gathered into buffers allocated once. Grayscale uses integer
+    luma weights. Rendering must be on for the buffer to update (see
+    emulator.create_emulator).
+    """
+
+    def __init__(self, screen, size=DEFAULT_PIXEL_SIZE, stack=DEFAULT_FRAME_STACK):
+        """
+        Args:
+            screen: (144, 160, 4) RGBA array, normally pyboy.screen.ndarray
+            size: (height, width) of the downsampled frames
+            stack: Number of frames kept
+        """
+        height, width = size
+        self.screen = screen
+        self.size = (height, width)
+        self.stack = stack
+        if SCREEN_HEIGHT % height == 0 and SCREEN_WIDTH % width == 0:
+            # The view follows the frame buffer, so nothing is gathered per frame.
+            self._view = screen[::SCREEN_HEIGHT // height, ::SCREEN_WIDTH // width]
+        else:
+            self._view = None
+            self._rows = (np.arange(height) * SCREEN_HEIGHT // height).astype(np.intp)
+            self._cols = (np.arange(width) * SCREEN_WIDTH // width).astype(np.intp)
+            self._row_buffer = np.empty((height, SCREEN_WIDTH, 4), dtype=np.uint8)
+            self._sampled = np.empty((height, width, 4), dtype=np.uint8)
+        self._luma = np.empty((height, width), dtype=np.uint16)
+        self._channel = np.empty((height, width), dtype=np.uint16)
+        self.frames = np.zeros((stack, height, width), dtype=np.uint8)
+        self.newest = stack - 1
+        self._stacked = np.empty_like(self.frames)
+
+    def _grab(self, out):
+        sampled = self._view
+        if sampled is None:
+            np.take(self.screen, self._rows, axis=0, out=self._row_buffer)
+            np.take(self._row_buffer, self._cols, axis=1, out=self._sampled)
+            sampled = self._sampled
+        np.multiply(sampled[:, :, 0], LUMA_WEIGHTS[0], out=self._luma, dtype=np.uint16)
+        for channel in (1, 2):
+            np.multiply(sampled[:, :, channel], LUMA_WEIGHTS[channel], out=self._channel, dtype=np.uint16)
+            np.add(self._luma, self._channel, out=self._luma)
+        np.right_shift(self._luma, 8, out=out, casting="unsafe")
+
+    def push(self):
+        """Add the current screen as the newest frame, replacing the oldest."""
+        self.newest = (self.newest + 1) % self.stack
+        self._grab(self.frames[self.newest])
+
+    def reset(self):
+        """Fill every slot with the current screen, e.g. at the start of an episode."""
+        self.newest = self.stack - 1
+        self._grab(self.frames[0])
+        self.frames[1:] = self.frames[0]
+
+    def stacked(self):
+        """
+        Frames ordered oldest to newest.
+
+        Returns:
+            np.ndarray: (stack, height, width) uint8. The array is reused by
+                the next call; copy it to keep it.
+        """
+        oldest = (self.newest + 1) % self.stack
+        count = self.stack - oldest
+        self._stacked[:count] = self.frames[oldest:]
+        self._stacked[count:] = self.frames[:oldest]
+        return self._stacked
@@ -0,0 +1,167 @@
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+
+import agent
+from discretizer import FIELD_MAX
+from emulator import advance, create_emulator
+from game_state import FIELD_INDEX, FIELD_NAMES, GameState, NUM_FIELDS
+from macros import MENU_MACRO
+from pixels import DEFAULT_FRAME_STACK, FrameStack
+from start_state import StartStateCache
+from vector_env import START_METHOD, fight_ended, wait_for_combat
+
+# Episodes still running after this many steps are truncated.
+MAX_EPISODE_STEPS = 5000
+
+# Observation types: the raw state array or the discretized state index.
+OBSERVATION_ARRAY = "array"
+OBSERVATION_INDEX = "index"
+
+_PLAYER_WINS = FIELD_INDEX["player_wins"]
+_ENEMY_WINS = FIELD_INDEX["enemy_wins"]
+
+
+class PowerQuestEnv(gym.Env):
+    """
+    Gymnasium environment for one PowerQuest fight round.
+
+    `reset` restores the cached start state and skips dialogue until
+    combat starts. `step` runs one action through an ActionExecutor and
+    returns the new observation and the RewardEngine reward. An episode
+    terminates when the round is decided or combat is left, the same rule
+    vector_env uses, and is truncated after `max_episode_steps`.
+
+    Observations are the state array from GameState.read_state_array, or
+    the Discretizer state index with observation="index". With
+    `pixel_size` set they become a dict of those "features" and "pixels",
+    the last `frame_stack` grayscale screens (see pixels.FrameStack).
+    """
+
+    metadata = {"render_modes": ["rgb_array"]}
+
+    def __init__(self, rom_path=agent.ROM_PATH, observation=OBSERVATION_ARRAY, discretizer=None,
+                 reward_engine=None, executor=None, max_episode_steps=MAX_EPISODE_STEPS,
+                 reset_noop_frames=0, render_mode=None, pixel_size=None, frame_stack=DEFAULT_FRAME_STACK):
+        """
+        Args:
+            rom_path: Path to the ROM
+            observation: OBSERVATION_ARRAY or OBSERVATION_INDEX
+            discretizer: Discretizer for index observations (default: agent.DISCRETIZER)
+            reward_engine: RewardEngine (default: agent.REWARD_ENGINE)
+            executor: ActionExecutor (default: agent.ACTION_EXECUTOR)
+            max_episode_steps: Steps before an episode is truncated
+            reset_noop_frames: `reset` idles a random number of frames up to
+                this, drawn from the seeded np_random, so episodes differ
+            render_mode: None or "rgb_array"
+            pixel_size: (height, width) to add downsampled pixel observations at
+            frame_stack: Number of stacked frames in pixel observations
+        """
+        if observation not in (OBSERVATION_ARRAY, OBSERVATION_INDEX):
+            raise ValueError(f"Unknown observation type '{observation}'")
+        self.observation = observation
+        self.discretizer = discretizer if discretizer is not None else agent.DISCRETIZER
+        self.reward_engine = reward_engine if reward_engine is not None else agent.REWARD_ENGINE
+        self.executor = executor if executor is not None else agent.ACTION_EXECUTOR
+        self.max_episode_steps = max_episode_steps
+        self.reset_noop_frames = reset_noop_frames
+        self.render_mode = render_mode
+
+        self.action_space = spaces.Discrete(len(agent.ACTION_SPACE))
+        if observation == OBSERVATION_INDEX:
+            self.observation_space = spaces.Discrete(self.discretizer.num_states)
+        else:
+            high = np.array([FIELD_MAX[name] for name in FIELD_NAMES], dtype=np.int32)
+            self.observation_space = spaces.Box(0, high, shape=(NUM_FIELDS,), dtype=np.int32)
+        if pixel_size is not None:
+            self.observation_space = spaces.Dict({
+                "features": self.observation_space,
+                "pixels": spaces.Box(0, 255, shape=(frame_stack, *pixel_size), dtype=np.uint8),
+            })
+
+        render = pixel_size is not None or render_mode is not None
+        self.pyboy = create_emulator(rom_path, headless=True, render=render)
+        self.game = GameState(self.pyboy)
+        self.frames = FrameStack(self.pyboy.screen.ndarray, pixel_size, frame_stack) if pixel_size else None
+        self.start_state = StartStateCache(self.pyboy, rom_path, MENU_MACRO)
+        self.start_state.prepare()
+        self._last = None
+        self._steps = 0
+
+    def _observe(self, state):
+        if self.observation == OBSERVATION_INDEX:
+            features = self.discretizer.index(state)
+        else:
+            features = state.copy()
+        if self.frames is None:
+            return features
+        return {"features": features, "pixels": self.frames.stacked().copy()}
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.start_state.restore()
+        if self.reset_noop_frames:
+            advance(self.pyboy, int(self.np_random.integers(self.reset_noop_frames + 1)))
+        wait_for_combat(self.pyboy, self.game, self.start_state)
+        if self.frames is not None:
+            self.frames.reset()
+        self._last = self.game.read_state_array()
+        self._steps = 0
+        return self._observe(self._last), {}
+
+    def step(self, action):
+        frames = self.executor.execute(self.pyboy, int(action))
+        if self.frames is not None:
+            self.frames.push()
+        current = self.game.read_state_array()
+        last = self._last
+        reward = self.reward_engine.compute(current, last)
+        terminated = fight_ended(current, last)
+        self._steps += 1
+        truncated = not terminated and self._steps >= self.max_episode_steps
+        info = {
+            "frames": frames,
+            "won": current.item(_PLAYER_WINS) != last.item(_PLAYER_WINS),
+            "lost": current.item(_ENEMY_WINS) != last.item(_ENEMY_WINS),
+        }
+        self._last = current
+        return self._observe(current), reward, terminated, truncated, info
+
+    def render(self):
+        if self.render_mode == "rgb_array":
+            return self.pyboy.screen.ndarray[:, :, :3].copy()
+        return None
+
+    def close(self):
+        if self.pyboy is not None:
+            self.pyboy.stop(save=False)
+            self.pyboy = None
+
+
+gym.register(id="PowerQuest-v0", entry_point="pq_env:PowerQuestEnv")
+
+
+def make_env(**kwargs):
+    """Return a thunk creating a PowerQuestEnv, as the vector env classes expect."""
+    def thunk():
+        return PowerQuestEnv(**kwargs)
+    return thunk
+
+
+def make_vector_env(num_envs, asynchronous=True, **kwargs):
+    """
+    Create `num_envs` environments stepped as one batch.
+
+    Args:
+        num_envs: Number of emulators
+        asynchronous: AsyncVectorEnv (one process per emulator, started with
+            START_METHOD) instead of SyncVectorEnv (all in this process)
+        **kwargs: Passed to PowerQuestEnv
+
+    Returns:
+        gym.vector.VectorEnv
+    """
+    env_fns = [make_env(**kwargs) for _ in range(num_envs)]
+    if asynchronous:
+        return gym.vector.AsyncVectorEnv(env_fns, context=START_METHOD)
+    return gym.vector.SyncVectorEnv(env_fns)
@@ -0,0 +1,210 @@
+import json
+import os
+
+import numpy as np
+
+# Data file listing the address of every game field. The PQ_MEMORY_MAP
+# environment variable selects another one, e.g. for another ROM revision.
+MEMORY_MAP_PATH = os.environ.get(
+    "PQ_MEMORY_MAP", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pq_memory_map.json"))
+
+# Byte orders a multi-byte field can be stored in.
+ENDIANNESS = ("big", "little")
+
+# Fields further apart than this many bytes are read with separate slices;
+# closer ones share one slice, since reading a few unused bytes is cheaper
+# than another memory access.
+MAX_READ_GAP = 256
+
+# Address constant names used before the registry existed:
+# name -> (field, byte), byte 0 being the most significant.
+LEGACY_NAMES = {
+    "PLAYER_HEALTH_HI": ("player_health", 0),
+    "PLAYER_HEALTH_LO": ("player_health", 1),
+    "ENEMY_HEALTH_HI": ("enemy_health", 0),
+    "ENEMY_HEALTH_LO": ("enemy_health", 1),
+    "PLAYER_WINS_ROUND": ("player_wins", 0),
+    "ENEMY_WINS_ROUND": ("enemy_wins", 0),
+    "PLAYER_X_POSITION_HI": ("player_x_position", 0),
+    "PLAYER_Y_POSITION_HI": ("player_y_position", 0),
+    "ENEMY_X_POSITION_HI": ("enemy_x_position", 0),
+    "ENEMY_Y_POSITION_HI": ("enemy_y_position", 0),
+    "GAME_STATE_FLAG": ("game_state_flag", 0),
+}
+
+_LOADED = {}
+
+
+class MemoryField:
+    """One unsigned game value of one or two bytes in emulator memory."""
+
+    def __init__(self, name, address, width=1, endianness="big"):
+        self.name = name
+        self.address = address
+        self.width = width
+        self.endianness = endianness
+
+    def byte_address(self, byte):
+        """Address of byte `byte` of the value, byte 0 being the most significant."""
+        if self.endianness == "big":
+            return self.address + byte
+        return self.address + self.width - 1 - byte
+
+    @property
+    def max_value(self):
+        return (1 << (8 * self.width)) - 1
+
+    def decode(self, memory):
+        """Read the value with one access per byte."""
+        value = 0
+        for byte in range(self.width):
+            value = (value << 8) + memory[self.byte_address(byte)]
+        return value
+
+
+class MemoryMap:
+    """
+    Validated registry of game fields and their addresses.
+
+    `read_plan` turns a list of field names into the few contiguous
+    memory slices that cover them and the index arrays that decode those
+    bytes, so every agent reads its state the same way, once per step.
+    """
+
+    def __init__(self, fields, name=""):
+        """
+        Args:
+            fields: MemoryField instances
+            name: Label of the map, e.g. the ROM revision it describes
+
+        Raises:
+            ValueError: If a field is repeated, misplaced or malformed, or two fields overlap
+        """
+        self.name = name
+        self.fields = {}
+        owners = {}
+        for field in fields:
+            if field.name in self.fields:
+                raise ValueError(f"Memory map field '{field.name}' is defined twice")
+            if field.width not in (1, 2):
+                raise ValueError(f"Memory map field '{field.name}' has width {field.width}, expected 1 or 2")
+            if field.endianness not in ENDIANNESS:
+                raise ValueError(f"Memory map field '{field.name}' has unknown endianness '{field.endianness}'")
+            if not 0 <= field.address <= 0x10000 - field.width:
+                raise ValueError(f"Memory map field '{field.name}' address 0x{field.address:X} is out of range")
+            for byte in range(field.width):
+                address = field.byte_address(byte)
+                if address in owners:
+                    raise ValueError(f"Memory map fields '{owners[address]}' and '{field.name}' "
+                                     f"overlap at 0x{address:04X}")
+                owners[address] = field.name
+            self.fields[field.name] = field
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a map from a JSON file such as
+        {"name": "...", "fields": [{"name": "player_health", "address": "0xC292",
+        "width": 2, "endianness": "big"}, ...]}. Addresses may be integers or
+        hex strings.
+
+        Raises:
+            ValueError: If the file is malformed or a field has no address yet
+        """
+        with open(path, "r") as map_file:
+            config = json.load(map_file)
+        fields = []
+        unset = []
+        for entry in config.get("fields", []):
+            address = entry.get("address")
+            if address is None:
+                unset.append(entry["name"])
+                continue
+            if isinstance(address, str):
+                address = int(address, 0)
+            fields.append(MemoryField(entry["name"], address, entry.get("width", 1), entry.get("endianness", "big")))
+        if unset:
+            raise ValueError(f"Memory map {path} has no address for {', '.join(unset)}. Fill them in, or set "
+                             f"PQ_MEMORY_MAP to a complete map.")
+        return cls(fields, config.get("name", ""))
+
+    def field(self, name):
+        if name not in self.fields:
+            raise ValueError(f"Memory map '{self.name}' has no field '{name}'")
+        return self.fields[name]
+
+    def read_plan(self, names, max_gap=MAX_READ_GAP):
+        """Return a ReadPlan decoding the fields `names`, in that order."""
+        return ReadPlan([self.field(name) for name in names], max_gap)
+
+
+class ReadPlan:
+    """
+    Reads a fixed list of fields with as few memory slices as possible.
+
+    The bytes of every slice are copied into one raw buffer. Each field
+    is then decoded as (high byte << 8) + low byte with two `np.take`
+    gathers; one-byte fields take their high byte from a zero pad at the
+    end of the buffer.
+    """
+
+    def __init__(self, fields, max_gap=MAX_READ_GAP):
+        addresses = sorted({field.byte_address(byte) for field in fields for byte in range(field.width)})
+        # (start, end, offset into the raw buffer) of each slice.
+        self.ranges = []
+        offset = 0
+        start = end = addresses[0]
+        for address in addresses:
+            if address - end > max_gap:
+                self.ranges.append((start, end, offset))
+                offset += end - start
+                start = address
+            end = address + 1
+        self.ranges.append((start, end, offset))
+        pad = offset + end - start
+        index = {address: range_offset + address - range_start
+                 for range_start, range_end, range_offset in self.ranges
+                 for address in range(range_start, range_end)}
+
+        self._raw = np.zeros(pad + 1, dtype=np.int32)
+        self._hi_index = np.array([pad if field.width == 1 else index[field.byte_address(0)]
+                                   for field in fields], dtype=np.intp)
+        self._lo_index = np.array([index[field.byte_address(field.width - 1)] for field in fields],
+                                  dtype=np.intp)
+        self._hi = np.zeros(len(fields), dtype=np.int32)
+
+    def read(self, memory, out):
+        """
+        Decode every field into `out`, an int32 array with one entry per field.
+
+        Raises:
+            Whatever `memory` raises for an unreadable slice
+        """
+        raw = self._raw
+        for start, end, offset in self.ranges:
+            raw[offset:offset + end - start] = memory[start:end]
+        np.take(raw, self._hi_index, out=self._hi)
+        np.take(raw, self._lo_index, out=out)
+        np.left_shift(self._hi, 8, out=self._hi)
+        np.add(out, self._hi, out=out)
+        return out
+
+
+def load(path=None):
+    """
+    Load and validate the memory map at `path` (default: MEMORY_MAP_PATH).
+    Each file is read once per process.
+    """
+    path = path or MEMORY_MAP_PATH
+    if path not in _LOADED:
+        _LOADED[path] = MemoryMap.from_file(path)
+    return _LOADED[path]
+
+
+def __getattr__(name):
+    # The LEGACY_NAMES constants are looked up in the map on first use, so
+    # importing this module never reads the data file.
+    if name in LEGACY_NAMES:
+        field, byte = LEGACY_NAMES[name]
+        return load().field(field).byte_address(byte)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,135 @@
+import json
+import signal
+import time
+
+# Phases of one training step.
+PHASE_EMULATION = "emulation"
+PHASE_STATE_READ = "state_read"
+PHASE_DISCRETIZE = "discretize"
+PHASE_REWARD = "reward"
+PHASE_LEARN = "learn"
+PHASE_DIALOGUE = "dialogue"
+
+# Histograms bucket durations by powers of two nanoseconds.
+HISTOGRAM_BUCKETS = 64
+
+
+class Profiler:
+    """
+    Per-phase step timers and counters that can be switched on at runtime.
+
+    Call sites do `start = profiler.start()` ... `profiler.stop(phase, start)`.
+    While disabled both calls return immediately, so the hooks can stay in
+    the training loop permanently.
+    """
+
+    def __init__(self, enabled=False, summary_every=0):
+        self.enabled = enabled
+        self.summary_every = summary_every
+        self.reset()
+
+    def reset(self):
+        """Clear all timings and counters."""
+        self.steps = 0
+        self.calls = {}
+        self.total_ns = {}
+        self.histograms = {}
+        self.counters = {}
+
+    def start(self):
+        """Return a start timestamp, or 0 when disabled."""
+        if not self.enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def stop(self, phase, start):
+        """Add the time since `start` to `phase`."""
+        if not self.enabled or not start:
+            return
+        elapsed = time.perf_counter_ns() - start
+        if phase not in self.calls:
+            self.calls[phase] = 0
+            self.total_ns[phase] = 0
+            self.histograms[phase] = [0] * HISTOGRAM_BUCKETS
+        self.calls[phase] += 1
+        self.total_ns[phase] += elapsed
+        self.histograms[phase][min(elapsed.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def count(self, name, amount=1):
+        """Add to a counter such as ticks or memory reads."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_step(self):
+        """Mark the end of a training step and print a summary every `summary_every` steps."""
+        if not self.enabled:
+            return
+        self.steps += 1
+        if self.summary_every and self.steps % self.summary_every == 0:
+            print(self.summary())
+
+    def toggle(self, *_):
+        """Switch profiling on or off. Installed as a SIGUSR1 handler by `install_toggle_signal`."""
+        self.enabled = not self.enabled
+        print(f"Profiling {'enabled' if self.enabled else 'disabled'}")
+
+    def install_toggle_signal(self):
+        """Let `kill -USR1 <pid>` switch profiling on and off in a running process."""
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.toggle)
+
+    def _percentile_ns(self, phase, fraction):
+        """Upper bound of the histogram bucket holding the given fraction of calls."""
+        target = fraction * self.calls[phase]
+        seen = 0
+        for bucket, count in enumerate(self.histograms[phase]):
+            seen += count
+            if seen >= target:
+                return 1 << bucket
+        return 1 << (HISTOGRAM_BUCKETS - 1)
+
+    def summary(self):
+        """Return a text table of time per phase and counters per step."""
+        steps = max(self.steps, 1)
+        total = sum(self.total_ns.values()) or 1
+        lines = [f"Profile over {self.steps} steps",
+                 f"{'phase':<12}{'calls':>10}{'share':>8}{'us/step':>10}{'p50 us':>10}{'p99 us':>10}"]
+        for phase in sorted(self.total_ns, key=self.total_ns.get, reverse=True):
+            lines.append(f"{phase:<12}{self.calls[phase]:>10}{self.total_ns[phase] / total:>8.1%}"
+                         f"{self.total_ns[phase] / steps / 1000:>10.1f}"
+                         f"{self._percentile_ns(phase, 0.5) / 1000:>10.1f}"
+                         f"{self._percentile_ns(phase, 0.99) / 1000:>10.1f}")
+        for name in sorted(self.counters):
+            lines.append(f"{name:<12}{self.counters[name] / steps:>10.2f} per step")
+        return "\n".join(lines)
+
+    def export_speedscope(self, path):
+        """
+        Write the accumulated phase times as a speedscope "sampled" profile,
+        one weighted sample per phase under a common "step" frame.
+        """
+        phases = sorted(self.total_ns)
+        frames = [{"name": "step"}] + [{"name": phase} for phase in phases]
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": "PowerQuest training step",
+                "unit": "nanoseconds",
+                "startValue": 0,
+                "endValue": sum(self.total_ns.values()),
+                "samples": [[0, index + 1] for index in range(len(phases))],
+                "weights": [self.total_ns[phase] for phase in phases],
+            }],
+            "name": "PowerQuest training step",
+            "exporter": "profiling.py",
+        }
+        with open(path, "w") as profile_file:
+            json.dump(profile, profile_file)
+
+    def export_collapsed(self, path):
+        """Write the phase times in collapsed-stack format for flamegraph.pl."""
+        with open(path, "w") as profile_file:
+            for phase in sorted(self.total_ns):
+                profile_file.write(f"step;{phase} {self.total_ns[phase]}\n")
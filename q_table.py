@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+
+
+class DenseQTable:
+    """
+    Q-table stored as one contiguous float32 array of shape
+    (num_states, num_actions). States are integer indices, so lookups are
+    plain array indexing with no hashing or per-state allocation.
+
+    Rows written since the last `clear_dirty` are tracked so checkpoints
+    can save only what changed.
+    """
+
+    def __init__(self, num_states, num_actions, values=None):
+        if values is None:
+            values = np.zeros((num_states, num_actions), dtype=np.float32)
+        elif values.shape != (num_states, num_actions):
+            raise ValueError(f"Q-table shape {values.shape} does not match ({num_states}, {num_actions})")
+        self.values = values
+        self.dirty = np.zeros(num_states, dtype=bool)
+
+    @property
+    def num_states(self):
+        return self.values.shape[0]
+
+    @property
+    def num_actions(self):
+        return self.values.shape[1]
+
+    def best_action(self, state):
+        """Return the greedy action for one state."""
+        return int(self.values[state].argmax())
+
+    def best_actions(self, states):
+        """Return the greedy action for each state in an array of states."""
+        return self.values[states].argmax(axis=1)
+
+    def update(self, state, action, reward, next_state, learning_rate, discount_factor, done=False):
+        """
+        Apply one Q-learning update.
+
+        Returns:
+            float: The change applied to Q(state, action)
+        """
+        next_max = 0.0 if done else self.values[next_state].max()
+        old_value = self.values[state, action]
+        delta = learning_rate * (reward + discount_factor * next_max - old_value)
+        self.values[state, action] = old_value + delta
+        self.dirty[state] = True
+        return float(delta)
+
+    def update_batch(self, states, actions, rewards, next_states, dones, learning_rate, discount_factor,
+                     weights=None):
+        """
+        Apply a batch of Q-learning updates.
+
+        All targets are computed from the table as it was before the batch.
+        Updates that hit the same (state, action) pair are summed.
+
+        Args:
+            states: int array of states
+            actions: int array of actions
+            rewards: float array of rewards
+            next_states: int array of next states
+            dones: bool array, True where next_states must not be bootstrapped from
+            learning_rate: Step size
+            discount_factor: Discount applied to the next state's value
+            weights: Optional per-transition importance-sampling weights
+
+        Returns:
+            np.ndarray: TD error of each transition before the update
+        """
+        states = np.asarray(states, dtype=np.intp)
+        actions = np.asarray(actions, dtype=np.intp)
+        next_max = self.values[np.asarray(next_states, dtype=np.intp)].max(axis=1)
+        next_max[np.asarray(dones, dtype=bool)] = 0.0
+        targets = np.asarray(rewards, dtype=np.float32) + discount_factor * next_max
+        td_error = targets - self.values[states, actions]
+        step = learning_rate * td_error if weights is None else learning_rate * weights * td_error
+        np.add.at(self.values, (states, actions), step)
+        self.dirty[states] = True
+        return td_error
+
+    def duplicate_weights(self, states, actions):
+        """
+        Weights for update_batch that average, rather than sum, repeated
+        (state, action) pairs: each transition gets one over its pair's
+        count in the batch.
+        """
+        pairs = np.asarray(states, dtype=np.intp) * self.num_actions + np.asarray(actions, dtype=np.intp)
+        _, inverse, counts = np.unique(pairs, return_inverse=True, return_counts=True)
+        return (1.0 / counts)[inverse].astype(np.float32)
+
+    def dirty_rows(self):
+        """Return the indices of rows changed since the last `clear_dirty`."""
+        return np.flatnonzero(self.dirty)
+
+    def clear_dirty(self):
+        self.dirty.fill(False)
+
+    def save(self, path):
+        """Save the table to a .npy file, replacing any existing file atomically."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as npy_file:
+            np.save(npy_file, self.values)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Load a table from a .npy file.
+
+        Args:
+            path: File written by `save`
+            mmap_mode: Passed to np.load. Use "r+" to share one table file
+                between processes, or "r" for a read-only view.
+        """
+        values = np.load(path, mmap_mode=mmap_mode)
+        if values.ndim != 2 or values.dtype != np.float32:
+            raise ValueError(f"{path} is not a float32 Q-table")
+        return cls(values.shape[0], values.shape[1], values)
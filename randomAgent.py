@@ -1,17 +1,15 @@
 # Imports
+import argparse
 from pyboy import PyBoy
 from pyboy.utils import WindowEvent
 import random
 import numpy as np
-
-# Game States found from Memory Analysis, using mGBA
-PLAYER_HEALTH_HI = 0xC292
-PLAYER_HEALTH_LO = 0xC293
-PLAYER_WINS = 0xC242
-
-ENEMY_HEALTH_HI = 0xC2FB
-ENEMY_HEALTH_LO = 0xC2FC
-ENEMY_WINS = 0xC243
+import agent
+from game_state import FIELD_INDEX, FIELD_NAMES, GameState
+from macros import MENU_MACRO
+from start_state import StartStateCache
+from trajectory import TrajectoryRecorder
+from vector_env import fight_ended
 
 # Action Space
 ACTION_DO_NOTHING = 0
@@ -32,62 +30,12 @@ action_space = [
     ACTION_LIGHT
 ]
 
-# Navigates initial menus to select English then 
-# start the single player game.
-def navigate_to_gameplay(pyboy):
-    """
-    This function will select the correct language and 
-    start the game.
-    """
-    print("Making menu selections.")
-
-    for _ in range(600):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_ARROW_RIGHT)
-    for _ in range(5):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_RIGHT)
-
-    for _ in range(20):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_ARROW_DOWN)
-    for _ in range(5):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_ARROW_DOWN)
-
-    for _ in range(20):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(5):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-
-    for _ in range(180):
-        pyboy.tick()
-
-    pyboy.send_input(WindowEvent.PRESS_BUTTON_A)
-    for _ in range(5):
-        pyboy.tick()
-    pyboy.send_input(WindowEvent.RELEASE_BUTTON_A)
-
-
-def get_game_state(pyboy):
+def get_game_state(snapshot):
     """
-    Read values from memory and store them in a dictionary.
+    Convert a state array from GameState.read_state_array to a dictionary.
+    The addresses come from the memory map (see pq_memory_map).
     """
-    player_health = (pyboy.memory[PLAYER_HEALTH_HI] << 8) + pyboy.memory[PLAYER_HEALTH_LO]
-    enemy_health = (pyboy.memory[ENEMY_HEALTH_HI] << 8) + pyboy.memory[ENEMY_HEALTH_LO]
-
-    state = {
-        "player_health": player_health,
-        "enemy_health": enemy_health,
-        "player_wins": pyboy.memory[PLAYER_WINS],
-        "enemy_wins": pyboy.memory[ENEMY_WINS]
-    }
-    return state
+    return dict(zip(FIELD_NAMES, snapshot.tolist()))
 
 def calculate_reward(current_game_state, last_game_state):
     """Calculate reward based on delta between states."""
@@ -114,24 +62,48 @@ EPSILON_DECAY = 0.9999
 MIN_EPSILON = 0.01
 
 def main():
+    parser = argparse.ArgumentParser(description="Play PowerQuest with random actions.")
+    parser.add_argument("--record",
+                        help="record transitions to this directory for offline training with trajectory.py")
+    args = parser.parse_args()
+
     # Attempt to open ROM.
     try:
-        pyboy = PyBoy('PowerQuest.gb')
+        pyboy = PyBoy(agent.ROM_PATH)
     except Exception as e:
         print(f"Error initializing PyBoy: {e}")
         return
 
-    navigate_to_gameplay(pyboy)
+    start_state = StartStateCache(pyboy, agent.ROM_PATH, MENU_MACRO)
+    if start_state.prepare():
+        print("Made menu selections.")
+    else:
+        print(f"Loaded start state from {start_state.path}")
     print("PyBoy initialized. Starting the game with the correct loop...")
     
-    last_game_state = get_game_state(pyboy)
-    while pyboy.tick() != WindowEvent.QUIT:
+    game = GameState(pyboy)
+    recorder = TrajectoryRecorder(args.record) if args.record else None
+    action = None
 
-        current_game_state = get_game_state(pyboy)
+    last_snapshot = game.read_state_array()
+    last_game_state = get_game_state(last_snapshot)
+    while pyboy.tick():
+
+        snapshot = game.read_state_array()
+        current_game_state = get_game_state(snapshot)
+        reward = calculate_reward(current_game_state, last_game_state)
         if reward != 0:
             print(f"State: {current_game_state}, Reward: {reward}")
+
+        # Only fight transitions are recorded, rewarded like main.py's, so
+        # recordings from both scripts can be trained on together.
+        if (recorder is not None and action is not None
+                and last_snapshot.item(FIELD_INDEX["game_state_flag"]) == agent.GAME_STATE_COMBAT):
+            recorder.add(last_snapshot, action, agent.REWARD_ENGINE.compute(snapshot, last_snapshot), snapshot,
+                         fight_ended(snapshot, last_snapshot))
         
         last_game_state = current_game_state
+        last_snapshot = snapshot
 
         action = random.choice(action_space)
 
@@ -160,6 +132,9 @@ def main():
         pyboy.send_input(WindowEvent.RELEASE_BUTTON_B)
 
     pyboy.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.transitions_written} transitions to {args.record}")
     print("Game window closed. Script finished.")
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity experience replay stored in preallocated NumPy ring arrays.
+
+    Transitions are (state index, action, reward, next state index, done).
+    Once full, the oldest transition is overwritten.
+    """
+
+    def __init__(self, capacity, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.position = 0
+        self.rng = np.random.default_rng(seed)
+        self._batch = None
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done=False):
+        """Store one transition and return the slot it was written to."""
+        index = self.position
+        self.states[index] = state
+        self.actions[index] = action
+        self.rewards[index] = reward
+        self.next_states[index] = next_state
+        self.dones[index] = done
+        self.position = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return index
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Store a batch of transitions, e.g. one step from every vectorized worker."""
+        count = len(states)
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return indices
+
+    def _gather(self, indices):
+        """Copy the sampled rows into reused batch arrays."""
+        batch_size = len(indices)
+        if self._batch is None or len(self._batch[0]) != batch_size:
+            self._batch = tuple(np.empty(batch_size, dtype=column.dtype)
+                                for column in (self.states, self.actions, self.rewards, self.next_states, self.dones))
+        for column, out in zip((self.states, self.actions, self.rewards, self.next_states, self.dones), self._batch):
+            np.take(column, indices, out=out)
+        return self._batch
+
+    def sample(self, batch_size):
+        """
+        Sample a uniform minibatch.
+
+        The returned arrays are reused by the next call to `sample`.
+
+        Returns:
+            tuple: (indices, states, actions, rewards, next_states, dones, weights).
+                weights is None for uniform sampling.
+        """
+        indices = self.rng.integers(0, self.size, size=batch_size)
+        return (indices, *self._gather(indices), None)
+
+    def update_priorities(self, indices, td_errors):
+        """Uniform sampling ignores priorities."""
+
+
+class SumTree:
+    """
+    Binary tree of priorities where every node holds the sum of its
+    children, so sampling in proportion to priority and changing a batch
+    of priorities both cost O(log capacity) per entry instead of a pass
+    over the whole buffer.
+
+    Leaves live at `tree[leaves:]`, the root at `tree[1]`.
+    """
+
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def set(self, index, value):
+        """Set one leaf. Plain scalar arithmetic is faster than `update` for a single entry."""
+        tree = self.tree
+        node = self.leaves + index
+        tree[node] = value
+        node //= 2
+        while node >= 1:
+            tree[node] = tree.item(2 * node) + tree.item(2 * node + 1)
+            node //= 2
+
+    def update(self, indices, values):
+        """Set the leaves at `indices` to `values` and refresh their ancestors."""
+        nodes = self.leaves + np.asarray(indices, dtype=np.intp)
+        self.tree[nodes] = values
+        # Rows of `children` are the two children of each node. Repeated
+        # parents are all assigned the same sum, so no dedup is needed.
+        children = self.tree.reshape(-1, 2)
+        nodes //= 2
+        while nodes.size and nodes[0] >= 1:
+            self.tree[nodes] = children[nodes].sum(axis=1)
+            nodes //= 2
+
+    def find(self, values, limit):
+        """
+        Return, for each of `values` in [0, total), the leaf whose
+        cumulative priority range contains it, clipped below `limit`
+        against rounding at the upper end.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.intp)
+        while nodes[0] < self.leaves:
+            nodes *= 2
+            left_sums = self.tree[nodes]
+            go_right = values >= left_sums
+            np.subtract(values, left_sums, out=values, where=go_right)
+            nodes += go_right
+        return np.minimum(nodes - self.leaves, limit - 1)
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Replay buffer that samples transitions in proportion to |TD error| ** alpha
+    and returns importance-sampling weights corrected by beta.
+    """
+
+    def __init__(self, capacity, alpha=0.6, beta=0.4, epsilon=1e-3, seed=None):
+        super().__init__(capacity, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        # Holds priority ** alpha, so sampling never re-powers the buffer.
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def add(self, state, action, reward, next_state, done=False):
+        index = super().add(state, action, reward, next_state, done)
+        self.tree.set(index, self.max_priority ** self.alpha)
+        return index
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        indices = super().add_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(indices, self.max_priority ** self.alpha)
+        return indices
+
+    def sample(self, batch_size):
+        total = self.tree.total
+        indices = self.tree.find(self.rng.random(batch_size) * total, self.size)
+        probabilities = self.tree.get(indices) / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        return (indices, *self._gather(indices), weights.astype(np.float32))
+
+    def update_priorities(self, indices, td_errors):
+        """Set the priorities of sampled transitions from their new TD errors."""
+        priorities = np.abs(td_errors) + self.epsilon
+        self.tree.update(indices, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -0,0 +1,346 @@
+import argparse
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+
+import numpy as np
+
+import agent
+from actions import ActionExecutor
+from discretizer import Discretizer
+from emulator import advance
+from frame_stats import FrameStats
+from game_state import FIELD_INDEX, round_decided
+from q_table import DenseQTable
+from rewards import RewardEngine
+from worker_pool import EmulatorPool
+
+# Directory main.py writes rollout logs to by default.
+ROLLOUT_DIR = "rollouts"
+
+# Decisions a branch follows the policy for after its first action.
+DEFAULT_HORIZON = 50
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+
+
+def episode_seed(seed, episode):
+    """Seed of episode `episode` of a run seeded with `seed`."""
+    return (seed << 32) | episode
+
+
+def save_emulator_state(pyboy):
+    """Return the emulator state as bytes."""
+    buffer = io.BytesIO()
+    pyboy.save_state(buffer)
+    return buffer.getvalue()
+
+
+def load_emulator_state(pyboy, state):
+    """Load emulator state bytes from save_emulator_state."""
+    pyboy.load_state(io.BytesIO(state))
+
+
+class RolloutLog:
+    """
+    Logs each training episode so it can be replayed exactly.
+
+    An episode runs from the first fight step after combat starts until
+    combat is left. `begin` snapshots the emulator before the episode's
+    first action; `end` writes `{n:06d}.state` with that snapshot and
+    `{n:06d}.json` with the episode's RNG seed, the state array its first
+    reward is measured from, the ActionExecutor settings, the frames the
+    caller advances between actions, whether rewards came from per-frame
+    FrameStats and the actions and rewards in order.
+    """
+
+    def __init__(self, directory=ROLLOUT_DIR, executor=None, gap_frames=0, frame_stats=False):
+        """
+        Args:
+            directory: Directory the episodes are written to
+            executor: ActionExecutor the actions are run with (default: agent.ACTION_EXECUTOR)
+            gap_frames: Frames the caller advances between two actions
+            frame_stats: True if rewards are computed with RewardEngine.compute_window
+        """
+        self.directory = directory
+        self.executor = executor if executor is not None else agent.ACTION_EXECUTOR
+        self.gap_frames = gap_frames
+        self.frame_stats = frame_stats
+        self.episodes_written = 0
+        self._state = None
+        self._seed = None
+        self._last = None
+        self._actions = []
+        self._rewards = []
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def active(self):
+        return self._state is not None
+
+    def begin(self, pyboy, seed, last_state):
+        """
+        Snapshot the emulator at the start of an episode.
+
+        Args:
+            pyboy: PyBoy instance
+            seed: Seed of the episode's exploration RNG
+            last_state: State array the first reward is measured from
+        """
+        self._state = save_emulator_state(pyboy)
+        self._seed = seed
+        self._last = [int(value) for value in last_state]
+        self._actions = []
+        self._rewards = []
+
+    def add(self, action, reward):
+        if self._state is not None:
+            self._actions.append(int(action))
+            self._rewards.append(float(reward))
+
+    def end(self):
+        """Write the current episode, if it took any actions."""
+        if self._state is None:
+            return
+        state, self._state = self._state, None
+        if not self._actions:
+            return
+        path = os.path.join(self.directory, f"{self.episodes_written:06d}")
+        try:
+            with open(f"{path}.state", "wb") as state_file:
+                state_file.write(state)
+            with open(f"{path}.json", "w") as meta_file:
+                json.dump({
+                    "seed": self._seed,
+                    "last_state": self._last,
+                    "hold_frames": self.executor.hold_frames,
+                    "frame_skip": self.executor.frame_skip,
+                    "action_repeat": self.executor.action_repeat,
+                    "gap_frames": self.gap_frames,
+                    "frame_stats": self.frame_stats,
+                    "actions": self._actions,
+                    "rewards": self._rewards,
+                }, meta_file)
+            self.episodes_written += 1
+        except Exception as e:
+            print(f"Warning: Cannot write rollout {path}: {e}")
+
+    def close(self):
+        self.end()
+
+
+def load_rollout(path):
+    """
+    Load an episode written by RolloutLog.
+
+    Args:
+        path: Episode path without extension, e.g. rollouts/000012
+
+    Returns:
+        tuple: (emulator state bytes, metadata dict)
+    """
+    with open(f"{path}.state", "rb") as state_file:
+        state = state_file.read()
+    with open(f"{path}.json", "r") as meta_file:
+        meta = json.load(meta_file)
+    return state, meta
+
+
+def executor_for(meta):
+    """ActionExecutor with the settings recorded in rollout metadata."""
+    return ActionExecutor(meta["hold_frames"], meta["frame_skip"], meta["action_repeat"])
+
+
+def replay(pyboy, game, state, actions, executor=None, reward_engine=None, gap_frames=0, last_state=None,
+           frame_stats=False):
+    """
+    Load `state` and run `actions` in order, advancing `gap_frames` frames
+    between actions. Each reward is measured from the state after the
+    previous action, so it includes the gap, as in main.py's loop.
+
+    Emulation is deterministic, so the same state, actions, executor
+    settings and gap frames always give the same rewards.
+
+    Args:
+        last_state: State array the first reward is measured from
+            (default: the state loaded)
+        frame_stats: Reward every frame of each action with
+            RewardEngine.compute_window, as main.py --frame-stats does
+
+    Returns:
+        np.ndarray: float64 reward of each action
+    """
+    executor = executor if executor is not None else agent.ACTION_EXECUTOR
+    reward_engine = reward_engine if reward_engine is not None else agent.REWARD_ENGINE
+    load_emulator_state(pyboy, state)
+    rewards = np.empty(len(actions), dtype=np.float64)
+    stats = FrameStats(game, executor.frames_per_action) if frame_stats else None
+    last = game.read_state_array() if last_state is None else np.asarray(last_state, dtype=np.int32)
+    for step, action in enumerate(actions):
+        if step and gap_frames:
+            advance(pyboy, gap_frames)
+        if stats is not None:
+            stats.begin(last)
+            executor.execute(pyboy, action, stats.sample)
+            current = stats.current.copy()
+            rewards[step] = reward_engine.compute_window(stats.window)
+        else:
+            executor.execute(pyboy, action)
+            current = game.read_state_array()
+            rewards[step] = reward_engine.compute(current, last)
+        last = current
+    return rewards
+
+
+def rollout(pyboy, game, q_table, steps, seed, epsilon=0.0, first_action=None):
+    """
+    Play up to `steps` epsilon-greedy decisions from the emulator's current
+    state with an RNG seeded with `seed`. Stops early when the round is
+    decided or combat is left.
+
+    Args:
+        q_table: DenseQTable the policy acts from
+        first_action: Take this action first instead of asking the policy
+
+    Returns:
+        dict: actions, rewards and total reward
+    """
+    rng = random.Random(seed)
+    actions = []
+    rewards = []
+    last = game.read_state_array()
+    for step in range(steps):
+        if step == 0 and first_action is not None:
+            action = first_action
+        else:
+            action = agent.choose_action(q_table, agent.DISCRETIZER.index(last), epsilon, rng)
+        agent.execute_action(pyboy, action)
+        current = game.read_state_array()
+        actions.append(int(action))
+        rewards.append(agent.REWARD_ENGINE.compute(current, last))
+        if round_decided(current, last) or current.item(_GAME_STATE_FLAG) != agent.GAME_STATE_COMBAT:
+            break
+        last = current
+    return {"actions": actions, "rewards": rewards, "total": float(sum(rewards))}
+
+
+def branch_job(worker, state, prefix, gap_frames, action, q_values, horizon, seed, epsilon=0.0,
+               discretizer_config=None, executor=None, reward_config=None):
+    """
+    EmulatorPool job for one branch: load `state`, replay `prefix`, take
+    `action`, then follow the policy for the rest of the horizon.
+
+    Returns:
+        dict: rollout result of the branch, plus the action the greedy
+            policy would have taken at the branch point
+    """
+    if discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(discretizer_config)
+    if executor is not None:
+        agent.ACTION_EXECUTOR = executor
+    if reward_config:
+        agent.REWARD_ENGINE = RewardEngine.from_config(reward_config)
+    replay(worker.pyboy, worker.game, state, prefix, gap_frames=gap_frames)
+    if prefix and gap_frames:
+        advance(worker.pyboy, gap_frames)
+    q_table = DenseQTable(*q_values.shape, q_values)
+    policy_action = q_table.best_action(agent.DISCRETIZER.index(worker.game.read_state_array()))
+    result = rollout(worker.pyboy, worker.game, q_table, horizon, seed, epsilon, first_action=action)
+    result["policy_action"] = int(policy_action)
+    return result
+
+
+def compare_branches(pool, state, q_values, prefix=(), gap_frames=0, horizon=DEFAULT_HORIZON, seed=0,
+                     epsilon=0.0, actions=agent.ACTION_SPACE, **job_options):
+    """
+    Fork one branch per action from the same point and compare their returns.
+
+    Every branch uses the same seed, so with epsilon > 0 the branches
+    share their exploration draws and differ only by the first action.
+    Deltas are relative to the branch of the action the policy picks
+    itself, so a positive delta is an action the lookahead prefers.
+
+    Args:
+        pool: EmulatorPool
+        state: Emulator state bytes
+        q_values: (S, A) Q-values the branches follow after their first action
+        prefix: Actions replayed from `state` before branching
+        gap_frames: Frames advanced between actions, as in the logged run
+        **job_options: discretizer_config, executor, reward_config for branch_job
+
+    Returns:
+        list: (action, total reward, delta, decisions) per action
+    """
+    futures = [pool.submit(branch_job, state, list(prefix), gap_frames, action, q_values, horizon, seed,
+                           epsilon, **job_options)
+               for action in actions]
+    results = [future.result() for future in futures]
+    totals = {action: result["total"] for action, result in zip(actions, results)}
+    baseline = totals.get(results[0]["policy_action"], max(totals.values()))
+    return [(action, result["total"], result["total"] - baseline, len(result["actions"]))
+            for action, result in zip(actions, results)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay logged episodes and compare actions from save states.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = subparsers.add_parser("replay", help="replay a logged episode and check its rewards")
+    replay_parser.add_argument("episode", help="episode path without extension, e.g. rollouts/000012")
+    replay_parser.add_argument("--reward-config", help="RewardEngine JSON config the episode was trained with")
+
+    branch_parser = subparsers.add_parser("branch", help="try every action at one step of a logged episode")
+    branch_parser.add_argument("episode", help="episode path without extension, e.g. rollouts/000012")
+    branch_parser.add_argument("--step", type=int, default=0, help="logged actions to replay before branching")
+    branch_parser.add_argument("--q-table", help="Q-table .npy the branches follow (default: all zeros)")
+    branch_parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="decisions per branch")
+    branch_parser.add_argument("--epsilon", type=float, default=0.0, help="exploration rate inside branches")
+    branch_parser.add_argument("--seed", type=int, help="branch RNG seed (default: the episode's seed)")
+    branch_parser.add_argument("--workers", type=int, default=min(mp.cpu_count(), len(agent.ACTION_SPACE)),
+                               help="emulator processes")
+    branch_parser.add_argument("--discretizer-config", help="Discretizer JSON config the table was trained with")
+    branch_parser.add_argument("--reward-config", help="RewardEngine JSON config")
+    branch_parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    args = parser.parse_args()
+
+    state, meta = load_rollout(args.episode)
+    executor = executor_for(meta)
+
+    if args.command == "replay":
+        from worker_pool import EmulatorWorker
+
+        if args.reward_config:
+            agent.REWARD_ENGINE = RewardEngine.from_config(args.reward_config)
+        worker = EmulatorWorker(agent.ROM_PATH)
+        try:
+            rewards = replay(worker.pyboy, worker.game, state, meta["actions"], executor,
+                             gap_frames=meta["gap_frames"], last_state=meta["last_state"],
+                             frame_stats=meta.get("frame_stats", False))
+        finally:
+            worker.close()
+        mismatches = np.flatnonzero(~np.isclose(rewards, meta["rewards"]))
+        print(f"Replayed {len(rewards)} actions (seed {meta['seed']}): total reward {rewards.sum():.2f}, "
+              f"logged {sum(meta['rewards']):.2f}")
+        if mismatches.size:
+            print(f"Warning: {mismatches.size} rewards differ from the log, first at step {mismatches[0]}")
+    else:
+        if args.discretizer_config:
+            agent.DISCRETIZER = Discretizer.from_config(args.discretizer_config)
+        if args.q_table:
+            q_values = DenseQTable.load(args.q_table).values
+        else:
+            q_values = np.zeros((agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE)), dtype=np.float32)
+        if q_values.shape[0] != agent.DISCRETIZER.num_states:
+            parser.error(f"{args.q_table} has {q_values.shape[0]} states, the discretizer has "
+                         f"{agent.DISCRETIZER.num_states}")
+        seed = meta["seed"] if args.seed is None else args.seed
+        with EmulatorPool(args.workers, args.rom) as pool:
+            results = compare_branches(pool, state, q_values, meta["actions"][:args.step], meta["gap_frames"],
+                                       args.horizon, seed, args.epsilon,
+                                       discretizer_config=args.discretizer_config, executor=executor,
+                                       reward_config=args.reward_config)
+        print(f"Branches at step {args.step} of {args.episode} over {args.horizon} decisions:")
+        for action, total, delta, decisions in sorted(results, key=lambda result: -result[1]):
+            print(f"  action {action}: total {total:9.2f}  delta {delta:+9.2f}  ({decisions} decisions)")
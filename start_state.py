@@ -0,0 +1,74 @@
+import hashlib
+import io
+import os
+
+# Directory the start-state snapshots are written to.
+STATE_CACHE_DIR = "state_cache"
+
+
+def rom_digest(rom_path):
+    """Return the SHA-1 hex digest of the ROM file."""
+    sha = hashlib.sha1()
+    with open(rom_path, "rb") as rom_file:
+        for chunk in iter(lambda: rom_file.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class StartStateCache:
+    """
+    Caches the emulator state reached after running an input macro,
+    normally the menu navigation macro.
+
+    The macro is only replayed when no snapshot exists for the current
+    ROM and compiled macro. Every later episode start or reset is a
+    `load_state` from memory instead of a thousand ticks.
+    """
+
+    def __init__(self, pyboy, rom_path, macro, cache_dir=STATE_CACHE_DIR):
+        self.pyboy = pyboy
+        self.macro = macro
+        key = f"{rom_digest(rom_path)[:16]}_{macro.name}_{macro.digest()[:16]}"
+        self.path = os.path.join(cache_dir, f"{key}.state")
+        self._state = None
+
+    def prepare(self):
+        """
+        Bring the emulator to the start state.
+
+        Returns:
+            bool: True if the macro had to be replayed, False if a cached snapshot was loaded.
+        """
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as state_file:
+                    self._state = state_file.read()
+                self.restore()
+                return False
+            except Exception as e:
+                print(f"Warning: Discarding unreadable start state {self.path}: {e}")
+                self._state = None
+
+        self.macro.run(self.pyboy)
+        buffer = io.BytesIO()
+        self.pyboy.save_state(buffer)
+        self._state = buffer.getvalue()
+        self._write()
+        return True
+
+    def restore(self):
+        """Load the cached start state into the emulator."""
+        if self._state is None:
+            raise RuntimeError("Start state has not been prepared")
+        self.pyboy.load_state(io.BytesIO(self._state))
+
+    def _write(self):
+        """Write the snapshot atomically so a crash never leaves a truncated state file."""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as state_file:
+                state_file.write(self._state)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Warning: Cannot write start state {self.path}: {e}")
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing as mp
+import random
+import time
+from collections import deque
+from concurrent.futures import as_completed
+
+import agent
+from discretizer import Discretizer
+from game_state import FIELD_INDEX, round_decided
+from q_table import DenseQTable
+from rewards import RewardEngine
+from vector_env import wait_for_combat
+from worker_pool import EmulatorPool
+
+# Module globals of agent.py a sweep may set.
+SWEEP_PARAMETERS = ("LEARNING_RATE", "DISCOUNT_FACTOR", "EPSILON_DECAY", "MIN_EPSILON")
+
+# Searched when no --space file is given: 3 * 3 * 2 * 2 = 36 grid trials.
+DEFAULT_SEARCH_SPACE = {
+    "LEARNING_RATE": [0.05, 0.1, 0.2],
+    "DISCOUNT_FACTOR": [0.8, 0.9, 0.95],
+    "EPSILON_DECAY": [0.999, 0.9999],
+    "MIN_EPSILON": [0.01, 0.05],
+}
+
+# Metrics reported for every trial, in results-table order.
+METRIC_COLUMNS = ("rounds", "wins", "win_rate", "reward_per_frame", "frames_to_threshold",
+                  "fight_frames", "steps_per_second")
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+_PLAYER_WINS = FIELD_INDEX["player_wins"]
+
+
+def load_search_space(path):
+    """
+    Load a search space from JSON. Each parameter maps to a list of values
+    or, for random search only, to {"uniform": [low, high]} or
+    {"log_uniform": [low, high]}.
+    """
+    with open(path, "r") as space_file:
+        space = json.load(space_file)
+    for name in space:
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError(f"Unknown sweep parameter '{name}', expected one of {', '.join(SWEEP_PARAMETERS)}")
+    return space
+
+
+def _defaults():
+    """Current values of every sweep parameter, so each trial sets all of them."""
+    return {name: getattr(agent, name) for name in SWEEP_PARAMETERS}
+
+
+def grid_trials(space):
+    """Every combination of the listed values."""
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grid search needs a list of values for '{name}'")
+    names = list(space)
+    trials = []
+    for values in itertools.product(*(space[name] for name in names)):
+        params = _defaults()
+        params.update(zip(names, values))
+        trials.append(params)
+    return trials
+
+
+def _sample(rng, values):
+    if isinstance(values, list):
+        return values[rng.randrange(len(values))]
+    if "uniform" in values:
+        low, high = values["uniform"]
+        return rng.uniform(low, high)
+    if "log_uniform" in values:
+        low, high = values["log_uniform"]
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    raise ValueError(f"Unknown distribution {values!r}")
+
+
+def random_trials(space, count, seed=0):
+    """`count` trials with every parameter drawn independently."""
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(count):
+        params = _defaults()
+        params.update((name, _sample(rng, values)) for name, values in space.items())
+        trials.append(params)
+    return trials
+
+
+def run_trial(worker, params, steps, seed, threshold=0.5, window=20,
+              reward_config=None, discretizer_config=None, return_q_values=False):
+    """
+    Train a fresh Q-table for `steps` fight steps. An EmulatorPool job.
+
+    The sweep parameters are set on the agent module before training, so
+    the trial uses exactly the code path of main.py.
+
+    Args:
+        worker: EmulatorWorker, already at the start state
+        params: Values for every name in SWEEP_PARAMETERS
+        steps: Fight steps to train for
+        seed: Seed for action selection
+        threshold: Win rate counted as "learned" for frames_to_threshold
+        window: Rounds the rolling win rate is taken over
+        reward_config: Optional RewardEngine JSON config
+        discretizer_config: Optional Discretizer JSON config
+        return_q_values: Also return the trained table as "q_values"
+
+    Returns:
+        dict: METRIC_COLUMNS. frames_to_threshold is the fight frames until
+            the rolling win rate first reached `threshold`, or -1 if it never did.
+    """
+    for name, value in params.items():
+        setattr(agent, name, value)
+    if reward_config:
+        agent.REWARD_ENGINE = RewardEngine.from_config(reward_config)
+    if discretizer_config:
+        agent.DISCRETIZER = Discretizer.from_config(discretizer_config)
+    random.seed(seed)
+
+    pyboy, game, start_state = worker.pyboy, worker.game, worker.start_state
+    wait_for_combat(pyboy, game, start_state)
+
+    q_table = DenseQTable(agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE))
+    epsilon = 1.0
+    frames_per_step = agent.ACTION_EXECUTOR.frames_per_action
+    last = game.read_state_array()
+    state = agent.DISCRETIZER.index(last)
+    rounds = wins = 0
+    total_reward = 0.0
+    recent = deque(maxlen=window)
+    frames_to_threshold = -1
+
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        q_table, current, state, epsilon = agent.game_state_fight(pyboy, game, q_table, last, state, epsilon)
+        total_reward += agent.REWARD_ENGINE.compute(current, last)
+        if round_decided(current, last):
+            won = current.item(_PLAYER_WINS) != last.item(_PLAYER_WINS)
+            rounds += 1
+            wins += won
+            recent.append(won)
+            if (frames_to_threshold < 0 and len(recent) == window
+                    and sum(recent) / window >= threshold):
+                frames_to_threshold = step * frames_per_step
+        last = current
+        if last.item(_GAME_STATE_FLAG) != agent.GAME_STATE_COMBAT:
+            wait_for_combat(pyboy, game, start_state)
+            last = game.read_state_array()
+            state = agent.DISCRETIZER.index(last)
+    elapsed = time.perf_counter() - start
+
+    fight_frames = steps * frames_per_step
+    metrics = {
+        "rounds": rounds,
+        "wins": wins,
+        "win_rate": wins / rounds if rounds else 0.0,
+        "reward_per_frame": total_reward / fight_frames if fight_frames else 0.0,
+        "frames_to_threshold": frames_to_threshold,
+        "fight_frames": fight_frames,
+        "steps_per_second": steps / elapsed if elapsed else float("inf"),
+    }
+    if return_q_values:
+        metrics["q_values"] = q_table.values
+    return metrics
+
+
+def run_sweep(trials, pool, steps, output=None, seed=0, **trial_options):
+    """
+    Run every trial as a job on an EmulatorPool.
+
+    Rows are appended to `output` (CSV) as trials finish, so an interrupted
+    sweep keeps its completed results.
+
+    Returns:
+        list: One dict per finished trial with its id, seed, parameters and metrics
+    """
+    columns = ["trial", "seed", *SWEEP_PARAMETERS, *METRIC_COLUMNS]
+    results = []
+    csv_file = writer = None
+    if output:
+        csv_file = open(output, "w", newline="")
+        writer = csv.DictWriter(csv_file, fieldnames=columns)
+        writer.writeheader()
+    try:
+        futures = {}
+        for trial, params in enumerate(trials):
+            future = pool.submit(run_trial, params, steps, seed + trial, **trial_options)
+            futures[future] = (trial, params)
+        for future in as_completed(futures):
+            trial, params = futures[future]
+            try:
+                metrics = future.result()
+            except Exception as e:
+                print(f"Warning: Trial {trial} failed: {e}")
+                continue
+            row = {"trial": trial, "seed": seed + trial, **params, **metrics}
+            results.append(row)
+            print(f"Trial {trial} done ({len(results)}/{len(trials)}): "
+                  f"win rate {metrics['win_rate']:.3f}, reward/frame {metrics['reward_per_frame']:.5f}")
+            if writer is not None:
+                writer.writerow(row)
+                csv_file.flush()
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    return results
+
+
+def print_results(results):
+    """Print the results table, best win rate first."""
+    header = (f"{'trial':>6}{'lr':>8}{'gamma':>8}{'eps decay':>12}{'min eps':>9}"
+              f"{'rounds':>8}{'win rate':>10}{'reward/frame':>14}{'frames to thr':>15}")
+    print(header)
+    print("-" * len(header))
+    for row in sorted(results, key=lambda row: (row["win_rate"], row["reward_per_frame"]), reverse=True):
+        print(f"{row['trial']:>6}{row['LEARNING_RATE']:>8.4g}{row['DISCOUNT_FACTOR']:>8.4g}"
+              f"{row['EPSILON_DECAY']:>12.6g}{row['MIN_EPSILON']:>9.4g}{row['rounds']:>8}"
+              f"{row['win_rate']:>10.3f}{row['reward_per_frame']:>14.5f}{row['frames_to_threshold']:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a hyperparameter sweep over parallel headless training runs.")
+    parser.add_argument("--space", help="JSON search space (default: DEFAULT_SEARCH_SPACE)")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid", help="search strategy")
+    parser.add_argument("--trials", type=int, default=20, help="number of random-search trials")
+    parser.add_argument("--steps", type=int, default=50000, help="fight steps per trial")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count(), help="trials run at once")
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; trial i uses seed + i")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="rolling win rate that counts as learned for frames-to-threshold")
+    parser.add_argument("--window", type=int, default=20, help="rounds in the rolling win rate")
+    parser.add_argument("--reward-config", help="RewardEngine JSON config used by every trial")
+    parser.add_argument("--discretizer-config", help="Discretizer JSON config used by every trial")
+    parser.add_argument("--output", default="sweep_results.csv", help="CSV file for the results table")
+    args = parser.parse_args()
+
+    space = load_search_space(args.space) if args.space else DEFAULT_SEARCH_SPACE
+    if args.search == "grid":
+        trials = grid_trials(space)
+    else:
+        trials = random_trials(space, args.trials, args.seed)
+    print(f"Running {len(trials)} trials of {args.steps} steps on {args.workers} workers")
+
+    with EmulatorPool(min(args.workers, len(trials)), args.rom) as pool:
+        results = run_sweep(trials, pool, args.steps, args.output, args.seed,
+                            threshold=args.threshold, window=args.window,
+                            reward_config=args.reward_config, discretizer_config=args.discretizer_config)
+    print_results(results)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,195 @@
+import argparse
+import json
+import threading
+
+import numpy as np
+
+# Log levels, same numbering as the logging module.
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+# Event kinds.
+EVENT_STEP = 0
+EVENT_DIALOGUE = 1
+EVENT_EPISODE_END = 2
+EVENT_RESET = 3
+EVENT_ERROR = 4
+EVENT_CHECKPOINT = 5
+EVENT_NAMES = {
+    EVENT_STEP: "step",
+    EVENT_DIALOGUE: "dialogue",
+    EVENT_EPISODE_END: "episode_end",
+    EVENT_RESET: "reset",
+    EVENT_ERROR: "error",
+    EVENT_CHECKPOINT: "checkpoint",
+}
+
+# One fixed-size binary record per event.
+EVENT_DTYPE = np.dtype([
+    ("step", "<u8"),
+    ("episode", "<u4"),
+    ("kind", "u1"),
+    ("level", "u1"),
+    ("state_flag", "u1"),
+    ("action", "i1"),
+    ("reward", "<f4"),
+    ("epsilon", "<f4"),
+    ("q_delta", "<f4"),
+])
+
+FILE_MAGIC = b"PQTELEMETRY1\n"
+
+
+class Telemetry:
+    """
+    Low-overhead event log for the training loop.
+
+    `record` writes one fixed-size record into a preallocated ring buffer;
+    a background thread appends new records to a binary file every
+    `flush_interval` seconds. Step events can be sampled (`sample_every`)
+    and anything below `level` is dropped. `log` is for rare human-readable
+    messages and only prints at or above `print_level`.
+    """
+
+    def __init__(self, path=None, capacity=1 << 16, level=INFO, print_level=WARNING,
+                 sample_every=1, flush_interval=1.0):
+        self.path = path
+        self.level = level
+        self.print_level = print_level
+        self.sample_every = max(1, sample_every)
+        self.ring = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.capacity = capacity
+        self.written = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.step = 0
+        self.episode = 0
+        self._file = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        if path is not None:
+            self._file = open(path, "wb")
+            self._file.write(FILE_MAGIC)
+            self._file.write(json.dumps(EVENT_DTYPE.descr).encode() + b"\n")
+            self._thread = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+            self._thread.start()
+
+    def record(self, kind, level=INFO, state_flag=0, action=-1, reward=0.0, epsilon=0.0, q_delta=0.0):
+        """Record one event. Step events also advance the step counter."""
+        if kind == EVENT_STEP:
+            self.step += 1
+            if self.step % self.sample_every:
+                return
+        if level < self.level or self._file is None:
+            return
+        self.ring[self.written % self.capacity] = (
+            self.step, self.episode, kind, level, state_flag, action, reward, epsilon, q_delta
+        )
+        self.written += 1
+
+    def end_episode(self, reward=0.0):
+        """Record the end of an episode and start counting the next one."""
+        self.record(EVENT_EPISODE_END, INFO, reward=reward)
+        self.episode += 1
+
+    def log(self, level, message):
+        """Print a human-readable message if it is at or above print_level."""
+        if level >= self.print_level:
+            print(message)
+
+    def flush(self):
+        """Append all records written since the last flush to the file."""
+        if self._file is None:
+            return
+        with self._lock:
+            written = self.written
+            start = self.flushed
+            if written - start > self.capacity:
+                self.dropped += written - start - self.capacity
+                start = written - self.capacity
+            first, last = start % self.capacity, written % self.capacity
+            if written == start:
+                return
+            if first < last:
+                chunk = self.ring[first:last].copy()
+            else:
+                chunk = np.concatenate((self.ring[first:], self.ring[:last]))
+            self._file.write(chunk.tobytes())
+            self._file.flush()
+            self.flushed = written
+
+    def _flush_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flush thread, write the remaining records and close the file."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+        if self.dropped:
+            print(f"Warning: Telemetry dropped {self.dropped} events (ring buffer overran)")
+
+
+def read_events(path):
+    """Load a telemetry file as a structured array of events (memory-mapped)."""
+    with open(path, "rb") as telemetry_file:
+        if telemetry_file.readline() != FILE_MAGIC:
+            raise ValueError(f"{path} is not a telemetry file")
+        descr = json.loads(telemetry_file.readline())
+        offset = telemetry_file.tell()
+    dtype = np.dtype([tuple(field) for field in descr])
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset)
+
+
+def summarize(events):
+    """
+    Summarize events per episode.
+
+    Returns:
+        list: One dict per episode with steps, total reward, epsilon range,
+            mean |Q-delta|, action counts, dialogue and error counts
+    """
+    summaries = []
+    for episode in np.unique(events["episode"]):
+        episode_events = events[events["episode"] == episode]
+        steps = episode_events[episode_events["kind"] == EVENT_STEP]
+        summary = {
+            "episode": int(episode),
+            "steps": int(len(steps)),
+            "reward": float(steps["reward"].sum()),
+            "epsilon_start": float(steps["epsilon"][0]) if len(steps) else 0.0,
+            "epsilon_end": float(steps["epsilon"][-1]) if len(steps) else 0.0,
+            "mean_abs_q_delta": float(np.abs(steps["q_delta"]).mean()) if len(steps) else 0.0,
+            "actions": np.bincount(steps["action"][steps["action"] >= 0]).tolist(),
+            "dialogues": int((episode_events["kind"] == EVENT_DIALOGUE).sum()),
+            "errors": int((episode_events["kind"] == EVENT_ERROR).sum()),
+        }
+        summaries.append(summary)
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a telemetry file written during training.")
+    parser.add_argument("path", help="telemetry file")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summaries = summarize(read_events(args.path))
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print(f"{'episode':>8}{'steps':>10}{'reward':>14}{'epsilon':>18}{'|dQ|':>10}{'dialogues':>11}{'errors':>8}")
+        for summary in summaries:
+            epsilon = f"{summary['epsilon_start']:.3f}->{summary['epsilon_end']:.3f}"
+            print(f"{summary['episode']:>8}{summary['steps']:>10}{summary['reward']:>14.2f}{epsilon:>18}"
+                  f"{summary['mean_abs_q_delta']:>10.4f}{summary['dialogues']:>11}{summary['errors']:>8}")
@@ -0,0 +1,35 @@
+import numpy as np
+
+from checkpoint import Checkpointer
+from q_table import DenseQTable
+
+
+def test_resume_round_trip_uses_deltas(tmp_path):
+    q_table = DenseQTable(4, 3)
+    checkpointer = Checkpointer(str(tmp_path))
+    checkpointer.save(q_table, 1.0, 0)
+    q_table.update(2, 1, 5.0, 3, 0.5, 0.9)
+    checkpointer.save(q_table, 0.5, 1)
+    assert len(checkpointer.manifest["deltas"]) == 1
+
+    loaded, epsilon, steps = Checkpointer(str(tmp_path)).load()
+    np.testing.assert_array_equal(loaded.values, q_table.values)
+    assert (epsilon, steps) == (0.5, 1)
+
+
+def test_save_after_mismatched_resume_writes_full_base(tmp_path):
+    old = DenseQTable(4, 3)
+    old.values[:] = 7.0
+    Checkpointer(str(tmp_path)).save(old, 0.5, 10)
+
+    # Resume finds a checkpoint of another shape and starts fresh.
+    checkpointer = Checkpointer(str(tmp_path))
+    assert checkpointer.load()[0].values.shape != (6, 3)
+    q_table = DenseQTable(6, 3)
+    q_table.values[1] = 2.0
+    assert checkpointer.save(q_table, 1.0, 1)
+    assert checkpointer.manifest["deltas"] == []
+
+    loaded, epsilon, steps = Checkpointer(str(tmp_path)).load()
+    np.testing.assert_array_equal(loaded.values, q_table.values)
+    assert (epsilon, steps) == (1.0, 1)
@@ -0,0 +1,25 @@
+import agent
+from fake_emulator import FAKE_MEMORY_MAP, ROUND_TRANSITION_FRAMES, FakePyBoy
+from game_state import GameState
+
+
+class CountingPyBoy(FakePyBoy):
+    def __init__(self):
+        super().__init__(0, FAKE_MEMORY_MAP)
+        self.frame_count = 0
+
+    def tick(self, count=1, render=True, sound=True):
+        self.frame_count += count
+        return super().tick(count, render, sound)
+
+
+def test_dialogue_returns_on_the_frame_a_press_starts_combat():
+    pyboy = CountingPyBoy()
+    game = GameState(pyboy, FAKE_MEMORY_MAP)
+    pyboy.start_round_transition()
+
+    assert agent.handle_dialogue(pyboy, game)
+    # The fake game leaves the dialogue on the first frame A is held after
+    # the transition, which is the first hold frame of the next press.
+    assert pyboy.frame_count == ROUND_TRANSITION_FRAMES + 1
+    assert game.game_state_flag == agent.GAME_STATE_COMBAT
@@ -0,0 +1,45 @@
+import numpy as np
+
+from frame_stats import FrameStats
+from game_state import FIELD_INDEX, NUM_FIELDS
+
+COMBAT = 0xC3
+
+
+class ScriptedGame:
+    """Returns one scripted state per read_state_array call."""
+
+    def __init__(self, states):
+        self.states = iter(states)
+
+    def read_state_array(self, out):
+        out[:] = next(self.states)
+        return out
+
+
+def state(flag=COMBAT, player_wins=0):
+    row = np.zeros(NUM_FIELDS, dtype=np.int32)
+    row[FIELD_INDEX["game_state_flag"]] = flag
+    row[FIELD_INDEX["player_wins"]] = player_wins
+    return row
+
+
+def run_window(frames):
+    stats = FrameStats(ScriptedGame(frames), len(frames))
+    stats.begin(state())
+    for _ in frames:
+        stats.sample()
+    return stats
+
+
+def test_mid_action_combat_exit_ends_episode():
+    stats = run_window([state(), state(flag=0xC2), state()])
+    assert stats.left_combat(COMBAT)
+    assert not stats.round_decided()
+    assert stats.current[FIELD_INDEX["game_state_flag"]] == COMBAT
+
+
+def test_mid_action_round_is_seen_after_reset():
+    stats = run_window([state(player_wins=1), state()])
+    assert stats.round_decided()
+    assert not stats.left_combat(COMBAT)
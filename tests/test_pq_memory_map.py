@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from game_state import FIELD_NAMES, NUM_FIELDS, SNAPSHOT_FIELDS
+from pq_memory_map import MemoryField, MemoryMap
+
+SHIPPED_MAP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pq_memory_map.json")
+
+
+# Stand-ins for the fields the shipped map has no confirmed address for,
+# so the read path can be tested. Not the game's real addresses.
+TEST_ADDRESSES = {
+    "player_x_position": "0xC400",
+    "player_y_position": "0xC401",
+    "enemy_x_position": "0xC402",
+    "enemy_y_position": "0xC403",
+    "game_state_flag": "0xC404",
+}
+
+
+def test_shipped_map_requires_unconfirmed_addresses():
+    with pytest.raises(ValueError, match="PQ_MEMORY_MAP") as error:
+        MemoryMap.from_file(SHIPPED_MAP)
+    for name in TEST_ADDRESSES:
+        assert name in str(error.value)
+
+
+def test_completed_shipped_map_builds_read_plan(tmp_path):
+    with open(SHIPPED_MAP, "r") as map_file:
+        config = json.load(map_file)
+    for entry in config["fields"]:
+        if entry["address"] is None:
+            entry["address"] = TEST_ADDRESSES[entry["name"]]
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps(config))
+
+    memory_map = MemoryMap.from_file(str(path))
+    for name, width in SNAPSHOT_FIELDS:
+        assert memory_map.field(name).width == width
+    plan = memory_map.read_plan(FIELD_NAMES)
+
+    memory = bytearray(np.random.default_rng(0).integers(0, 256, 0x10000, dtype=np.uint8).tobytes())
+    out = plan.read(memory, np.empty(NUM_FIELDS, dtype=np.int32))
+    assert out.tolist() == [memory_map.field(name).decode(memory) for name in FIELD_NAMES]
+
+
+def test_read_plan_splits_distant_fields_and_decodes_little_endian():
+    memory_map = MemoryMap([MemoryField("a", 0xC000, 2, "little"), MemoryField("b", 0xD000, 1)])
+    plan = memory_map.read_plan(["b", "a"])
+    memory = bytearray(0x10000)
+    memory[0xC000:0xC002] = b"\x34\x12"
+    memory[0xD000] = 7
+    assert plan.read(memory, np.empty(2, dtype=np.int32)).tolist() == [7, 0x1234]
+    assert len(plan.ranges) == 2
+
+
+def test_user_map_with_missing_address_is_rejected(tmp_path):
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps({"fields": [{"name": "player_health", "address": None, "width": 2}]}))
+    with pytest.raises(ValueError, match="player_health"):
+        MemoryMap.from_file(str(path))
+
+
+def test_overlapping_fields_are_rejected():
+    with pytest.raises(ValueError, match="overlap"):
+        MemoryMap([MemoryField("a", 0xC000, 2), MemoryField("b", 0xC001)])
@@ -0,0 +1,25 @@
+import numpy as np
+
+from replay_buffer import PrioritizedReplayBuffer, SumTree
+
+
+def test_sum_tree_tracks_totals_and_finds_leaves():
+    tree = SumTree(5)
+    tree.update([0, 1, 2, 3, 4], [1.0, 2.0, 3.0, 4.0, 5.0])
+    tree.update([2], 0.5)
+    assert tree.total == 12.5
+    assert tree.find([0.0, 0.99, 1.0, 3.2, 3.5, 7.49, 7.5, 12.49], 5).tolist() == [0, 0, 1, 2, 3, 3, 4, 4]
+
+
+def test_prioritized_sampling_follows_priorities():
+    replay = PrioritizedReplayBuffer(8, alpha=1.0, beta=1.0, epsilon=0.0, seed=0)
+    for state in range(4):
+        replay.add(state, 0, 0.0, state)
+    replay.update_priorities(np.arange(4), np.array([1.0, 0.0, 3.0, 6.0]))
+
+    indices, states, *_, weights = replay.sample(20000)
+    frequencies = np.bincount(indices, minlength=4) / len(indices)
+    np.testing.assert_allclose(frequencies, [0.1, 0.0, 0.3, 0.6], atol=0.02)
+    np.testing.assert_array_equal(states, indices)
+    # Importance weights are inversely proportional to the priority.
+    assert np.isclose(weights[indices == 3][0] / weights[indices == 0][0], 1 / 6)
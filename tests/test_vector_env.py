@@ -0,0 +1,33 @@
+import pytest
+
+import agent
+from vector_env import VectorEmulator, wait_for_combat
+
+
+class StuckGame:
+    game_state_flag = agent.GAME_STATE_DIALOGUE
+
+
+class CountingStartState:
+    def __init__(self):
+        self.restores = 0
+
+    def restore(self):
+        self.restores += 1
+
+
+def test_wait_for_combat_gives_up_after_max_restores(monkeypatch):
+    monkeypatch.setattr(agent, "handle_dialogue", lambda pyboy, game: False)
+    start_state = CountingStartState()
+    with pytest.raises(RuntimeError, match="after 3 start state restores"):
+        wait_for_combat(None, StuckGame(), start_state, max_attempts=2, max_restores=3)
+    assert start_state.restores == 3
+
+
+def test_worker_setup_error_reaches_parent(tmp_path):
+    env = VectorEmulator(1, str(tmp_path / "missing.gb"))
+    try:
+        with pytest.raises(RuntimeError, match="Emulator worker 0 failed"):
+            env.reset()
+    finally:
+        env.close()
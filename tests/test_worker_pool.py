@@ -0,0 +1,21 @@
+import pytest
+
+from worker_pool import EmulatorPool
+
+
+def return_one(worker):
+    return 1
+
+
+def test_startup_failure_fails_jobs_with_the_worker_traceback(tmp_path):
+    pool = EmulatorPool(1, str(tmp_path / "missing.gb"))
+    try:
+        futures = [pool.submit(return_one) for _ in range(5)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="failed to start(.|\n)*missing.gb"):
+                future.result(timeout=120)
+        with pytest.raises(RuntimeError, match="missing.gb"):
+            pool.submit(return_one).result(timeout=5)
+        assert not any(process.is_alive() for process in pool.processes)
+    finally:
+        pool.close()
@@ -0,0 +1,246 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+import agent
+from discretizer import Discretizer
+from game_state import FIELD_INDEX, NUM_FIELDS
+from q_table import DenseQTable
+from rewards import RewardEngine
+from vector_env import fight_ended, wait_for_combat
+
+# Directory trajectory chunks are written to.
+TRAJECTORY_DIR = "trajectories"
+
+# One .npy file per column in every chunk directory: (name, dtype, per-row shape).
+# Snapshot fields are at most 16 bits wide, so states are stored as uint16.
+COLUMNS = (
+    ("states", np.uint16, (NUM_FIELDS,)),
+    ("actions", np.int8, ()),
+    ("rewards", np.float32, ()),
+    ("next_states", np.uint16, (NUM_FIELDS,)),
+    ("dones", np.bool_, ()),
+)
+
+
+class TrajectoryRecorder:
+    """
+    Buffers fight transitions in preallocated columns and writes them out
+    as chunk directories of .npy files, one per column.
+
+    Transitions keep the raw snapshot fields rather than state indices, so
+    recorded play can be re-discretized and re-rewarded offline. A chunk
+    is written when the buffer fills and on `close`.
+    """
+
+    def __init__(self, directory=TRAJECTORY_DIR, chunk_size=1 << 16):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.columns = {name: np.zeros((chunk_size, *shape), dtype=dtype) for name, dtype, shape in COLUMNS}
+        self.count = 0
+        self.chunks_written = 0
+        self.transitions_written = 0
+        self._prefix = f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, state, action, reward, next_state, done=False):
+        """
+        Record one transition.
+
+        Args:
+            state: State array (GameState.read_state_array) before the action
+            action: Action taken
+            reward: Reward received
+            next_state: State array after the action
+            done: True if the transition ended the fight (round decided or combat left)
+        """
+        row = self.count
+        columns = self.columns
+        columns["states"][row] = state
+        columns["actions"][row] = action
+        columns["rewards"][row] = reward
+        columns["next_states"][row] = next_state
+        columns["dones"][row] = done
+        self.count = row + 1
+        if self.count == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered transitions as a new chunk."""
+        if self.count == 0:
+            return
+        path = os.path.join(self.directory, f"{self._prefix}_{self.chunks_written:06d}")
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path)
+        for name, _, _ in COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), self.columns[name][:self.count])
+        os.replace(tmp_path, path)
+        self.chunks_written += 1
+        self.transitions_written += self.count
+        self.count = 0
+
+    def close(self):
+        """Write any remaining transitions."""
+        self.flush()
+
+
+def record_play(worker, directory, steps, q_values=None, epsilon=1.0, seed=0):
+    """
+    Play `steps` fight steps and record every transition. An EmulatorPool job.
+
+    Actions are epsilon-greedy on `q_values`, or uniformly random when no
+    table is given. Rewards come from agent.REWARD_ENGINE.
+
+    Returns:
+        int: Transitions written
+    """
+    rng = random.Random(seed)
+    recorder = TrajectoryRecorder(directory)
+    pyboy, game = worker.pyboy, worker.game
+    wait_for_combat(pyboy, game, worker.start_state)
+    last = game.read_state_array()
+    for _ in range(steps):
+        if q_values is None or rng.random() < epsilon:
+            action = rng.choice(agent.ACTION_SPACE)
+        else:
+            action = int(q_values[agent.DISCRETIZER.index(last)].argmax())
+        agent.execute_action(pyboy, action)
+        current = game.read_state_array()
+        recorder.add(last, action, agent.REWARD_ENGINE.compute(current, last), current,
+                     fight_ended(current, last))
+        last = current
+        if last.item(FIELD_INDEX["game_state_flag"]) != agent.GAME_STATE_COMBAT:
+            wait_for_combat(pyboy, game, worker.start_state)
+            last = game.read_state_array()
+    recorder.close()
+    return recorder.transitions_written
+
+
+def load_chunk(path, mmap_mode="r"):
+    """
+    Load one chunk written by TrajectoryRecorder.
+
+    Returns:
+        dict: Column name to array, memory-mapped unless mmap_mode is None
+    """
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name, _, _ in COLUMNS}
+
+
+def find_chunks(paths):
+    """Expand trajectory directories and chunk directories into a sorted list of chunk paths."""
+    chunks = []
+    for path in paths:
+        if os.path.exists(os.path.join(path, "actions.npy")):
+            chunks.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            chunk = os.path.join(path, name)
+            if not name.endswith(".tmp") and os.path.exists(os.path.join(chunk, "actions.npy")):
+                chunks.append(chunk)
+    return chunks
+
+
+def offline_train(chunk_paths, q_table, discretizer, learning_rate, discount_factor,
+                  epochs=1, batch_size=256, reward_engine=None):
+    """
+    Run Q-learning passes over recorded chunks without an emulator.
+
+    Each chunk is discretized in one batch call, then learned from in
+    minibatches of `batch_size` consecutive transitions with
+    DenseQTable.update_batch. update_batch sums updates to the same
+    (state, action) pair, so each transition is weighted by one over its
+    pair's count in the minibatch; a pair then moves by the learning rate
+    times its mean TD error, however many times it repeats.
+
+    Args:
+        chunk_paths: Chunk directories from find_chunks
+        q_table: DenseQTable sized for `discretizer.num_states`
+        discretizer: Discretizer mapping the recorded states to rows
+        learning_rate: Step size
+        discount_factor: Discount applied to the next state's value
+        epochs: Passes over all chunks
+        batch_size: Transitions per update_batch call
+        reward_engine: If given, rewards are recomputed from the recorded
+            states instead of using the recorded rewards
+
+    Returns:
+        dict: transitions learned from, seconds and transitions per second
+    """
+    transitions = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for path in chunk_paths:
+            chunk = load_chunk(path)
+            states = discretizer.index_batch(chunk["states"])
+            next_states = discretizer.index_batch(chunk["next_states"])
+            actions = np.asarray(chunk["actions"], dtype=np.intp)
+            dones = np.asarray(chunk["dones"])
+            if reward_engine is None:
+                rewards = np.asarray(chunk["rewards"])
+            else:
+                rewards = reward_engine.compute_batch(np.asarray(chunk["next_states"], dtype=np.int32),
+                                                      np.asarray(chunk["states"], dtype=np.int32))
+            for first in range(0, len(actions), batch_size):
+                last = first + batch_size
+                weights = q_table.duplicate_weights(states[first:last], actions[first:last])
+                q_table.update_batch(states[first:last], actions[first:last], rewards[first:last],
+                                     next_states[first:last], dones[first:last], learning_rate, discount_factor,
+                                     weights)
+            transitions += len(actions)
+    elapsed = time.perf_counter() - start
+    return {
+        "transitions": transitions,
+        "seconds": elapsed,
+        "transitions_per_second": transitions / elapsed if elapsed else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a Q-table offline from recorded trajectories.")
+    parser.add_argument("paths", nargs="*", default=[TRAJECTORY_DIR], help="trajectory or chunk directories")
+    parser.add_argument("--epochs", type=int, default=1, help="passes over the recorded transitions")
+    parser.add_argument("--batch-size", type=int, default=256, help="transitions per batched update")
+    parser.add_argument("--learning-rate", type=float, default=agent.LEARNING_RATE)
+    parser.add_argument("--discount-factor", type=float, default=agent.DISCOUNT_FACTOR)
+    parser.add_argument("--discretizer-config", help="Discretizer JSON config")
+    parser.add_argument("--reward-config", help="recompute rewards with this RewardEngine JSON config")
+    parser.add_argument("--recompute-rewards", action="store_true",
+                        help="recompute rewards with the default RewardEngine")
+    parser.add_argument("--record-steps", type=int, default=0,
+                        help="first record this many random-play steps per worker into the first path")
+    parser.add_argument("--workers", type=int, default=1, help="emulator workers used with --record-steps")
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    parser.add_argument("--init", help="start from this Q-table .npy file instead of zeros")
+    parser.add_argument("--output", default="q_table.npy", help="where to save the trained Q-table")
+    args = parser.parse_args()
+
+    discretizer = Discretizer.from_config(args.discretizer_config) if args.discretizer_config else Discretizer()
+    reward_engine = None
+    if args.reward_config:
+        reward_engine = RewardEngine.from_config(args.reward_config)
+    elif args.recompute_rewards:
+        reward_engine = RewardEngine()
+    if args.init:
+        q_table = DenseQTable.load(args.init)
+        if q_table.num_states != discretizer.num_states:
+            parser.error(f"{args.init} has {q_table.num_states} states, the discretizer has {discretizer.num_states}")
+    else:
+        q_table = DenseQTable(discretizer.num_states, len(agent.ACTION_SPACE))
+
+    if args.record_steps > 0:
+        from worker_pool import EmulatorPool
+        with EmulatorPool(args.workers, args.rom) as pool:
+            futures = [pool.submit(record_play, args.paths[0], args.record_steps, seed=worker)
+                       for worker in range(args.workers)]
+            recorded = sum(future.result() for future in futures)
+        print(f"Recorded {recorded} transitions to {args.paths[0]}")
+
+    chunks = find_chunks(args.paths)
+    stats = offline_train(chunks, q_table, discretizer, args.learning_rate, args.discount_factor,
+                          args.epochs, args.batch_size, reward_engine)
+    q_table.save(args.output)
+    print(f"Learned from {stats['transitions']} transitions in {len(chunks)} chunks "
+          f"({stats['transitions_per_second']:.0f} transitions/s). Q-table saved to {args.output}.")
@@ -0,0 +1,237 @@
+import argparse
+import multiprocessing as mp
+import traceback
+
+import numpy as np
+
+import agent
+from game_state import FIELD_INDEX, round_decided
+from macros import MENU_MACRO
+from q_table import DenseQTable
+
+# Multiprocessing start method. PyBoy and SDL are not fork-safe, so every
+# worker starts a fresh interpreter.
+START_METHOD = "spawn"
+
+
+_GAME_STATE_FLAG = FIELD_INDEX["game_state_flag"]
+
+
+def fight_ended(state, last_state):
+    """A fight step ends the episode when a round is decided or combat is left."""
+    return round_decided(state, last_state) or state.item(_GAME_STATE_FLAG) != agent.GAME_STATE_COMBAT
+
+
+def wait_for_combat(pyboy, game, start_state, max_attempts=10, max_restores=5):
+    """
+    Run the dialogue handler until combat starts, restoring the start state
+    after `max_attempts` failed attempts in a row.
+
+    Raises:
+        RuntimeError: If combat has not started after `max_restores` restores
+    """
+    attempts = 0
+    restores = 0
+    while game.game_state_flag != agent.GAME_STATE_COMBAT:
+        if not agent.handle_dialogue(pyboy, game):
+            attempts += 1
+            if attempts >= max_attempts:
+                if restores >= max_restores:
+                    raise RuntimeError(f"Combat did not start after {restores} start state restores "
+                                       f"(game state flag 0x{game.game_state_flag:02X})")
+                start_state.restore()
+                restores += 1
+                attempts = 0
+
+
+def _worker(conn, rom_path):
+    """
+    Emulator worker process. Owns one PyBoy and one GameState and
+    answers "reset", "step" and "close" commands sent over `conn`.
+    Every reply is (True, result), or (False, traceback) if the command
+    or the worker's setup failed.
+    """
+    from emulator import create_emulator
+    from game_state import GameState
+    from start_state import StartStateCache
+
+    pyboy = None
+    try:
+        try:
+            pyboy = create_emulator(rom_path, headless=True)
+            game = GameState(pyboy)
+            start_state = StartStateCache(pyboy, rom_path, MENU_MACRO)
+            start_state.prepare()
+            last_snapshot = None
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+            return
+
+        while True:
+            command, data = conn.recv()
+            if command == "close":
+                break
+            try:
+                if command == "reset":
+                    start_state.restore()
+                    wait_for_combat(pyboy, game, start_state)
+                    last_snapshot = game.read_state_array()
+                    conn.send((True, agent.DISCRETIZER.index(last_snapshot)))
+                elif command == "step":
+                    agent.execute_action(pyboy, data)
+                    snapshot = game.read_state_array()
+                    reward = agent.REWARD_ENGINE.compute(snapshot, last_snapshot)
+                    done = fight_ended(snapshot, last_snapshot)
+                    if done:
+                        # Auto-reset: the returned state belongs to the next fight.
+                        wait_for_combat(pyboy, game, start_state)
+                        snapshot = game.read_state_array()
+                    last_snapshot = snapshot
+                    conn.send((True, (agent.DISCRETIZER.index(snapshot), reward, done)))
+            except Exception:
+                conn.send((False, traceback.format_exc()))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        if pyboy is not None:
+            pyboy.stop(save=False)
+        conn.close()
+
+
+class VectorEmulator:
+    """
+    Runs N PyBoy emulators in separate processes and steps them as a batch.
+
+    `step` is lockstep. `step_async` / `step_wait` let the caller do
+    learner work while the emulators advance.
+    """
+
+    def __init__(self, num_workers, rom_path=agent.ROM_PATH):
+        ctx = mp.get_context(START_METHOD)
+        self.num_workers = num_workers
+        self.connections = []
+        self.processes = []
+        for _ in range(num_workers):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(child_conn, rom_path), daemon=True)
+            process.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+        self._waiting = False
+
+    def _receive_all(self):
+        """
+        Collect one reply from every worker.
+
+        Raises:
+            RuntimeError: If a worker failed, with the worker's traceback
+        """
+        replies = [conn.recv() for conn in self.connections]
+        for index, (ok, payload) in enumerate(replies):
+            if not ok:
+                raise RuntimeError(f"Emulator worker {index} failed:\n{payload}")
+        return [payload for _, payload in replies]
+
+    def reset(self):
+        """Reset every worker to the start state and return the first state indices."""
+        for conn in self.connections:
+            conn.send(("reset", None))
+        return np.array(self._receive_all(), dtype=np.intp)
+
+    def step_async(self, actions):
+        """Send one action to each worker without waiting for the result."""
+        if self._waiting:
+            raise RuntimeError("step_async called twice without step_wait")
+        for conn, action in zip(self.connections, actions):
+            conn.send(("step", int(action)))
+        self._waiting = True
+
+    def step_wait(self):
+        """
+        Collect the results of the last `step_async`.
+
+        Returns:
+            tuple: (states, rewards, dones) arrays, one entry per worker
+
+        Raises:
+            RuntimeError: If a worker failed
+        """
+        self._waiting = False
+        results = self._receive_all()
+        states, rewards, dones = zip(*results)
+        return (np.array(states, dtype=np.intp),
+                np.array(rewards, dtype=np.float32),
+                np.array(dones, dtype=bool))
+
+    def step(self, actions):
+        """Step every worker once in lockstep."""
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        """Stop all workers."""
+        if self._waiting:
+            try:
+                self.step_wait()
+            except (RuntimeError, EOFError):
+                pass
+        for conn in self.connections:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def train_vectorized(num_workers, total_steps, rom_path=agent.ROM_PATH):
+    """
+    Train one shared Q-table from `num_workers` emulators.
+
+    Args:
+        num_workers: Number of emulator processes
+        total_steps: Number of transitions to collect across all workers
+        rom_path: Path to the ROM
+
+    Returns:
+        DenseQTable: The trained Q-table
+    """
+    q_table = DenseQTable(agent.DISCRETIZER.num_states, len(agent.ACTION_SPACE))
+    epsilon = 1.0
+    env = VectorEmulator(num_workers, rom_path)
+    try:
+        states = env.reset()
+        steps = 0
+        while steps < total_steps:
+            actions = q_table.best_actions(states)
+            explore = np.random.random_sample(num_workers) < epsilon
+            actions[explore] = np.random.randint(len(agent.ACTION_SPACE), size=int(explore.sum()))
+            next_states, rewards, dones = env.step(actions)
+            # Workers often share a state, so average their updates to the same pair.
+            q_table.update_batch(states, actions, rewards, next_states, dones,
+                                 agent.LEARNING_RATE, agent.DISCOUNT_FACTOR,
+                                 q_table.duplicate_weights(states, actions))
+            states = next_states
+            steps += num_workers
+
+            if epsilon > agent.MIN_EPSILON:
+                epsilon = max(agent.MIN_EPSILON, epsilon * agent.EPSILON_DECAY ** num_workers)
+    finally:
+        env.close()
+    return q_table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the PowerQuest agent on several emulators at once.")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count(), help="number of emulator processes")
+    parser.add_argument("--steps", type=int, default=100000, help="total transitions to collect")
+    parser.add_argument("--rom", default=agent.ROM_PATH, help="path to the PowerQuest ROM")
+    parser.add_argument("--output", default="q_table.npy", help="where to save the trained Q-table")
+    args = parser.parse_args()
+
+    q_table = train_vectorized(args.workers, args.steps, args.rom)
+    q_table.save(args.output)
+    print(f"Training finished. Q-table saved to {args.output}.")
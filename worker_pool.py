@@ -0,0 +1,304 @@
+import multiprocessing as mp
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+import agent
+from macros import MENU_MACRO
+from vector_env import START_METHOD
+
+# Module globals of agent.py that jobs may replace. Every job starts with
+# the values they had when the worker started.
+JOB_GLOBALS = ("LEARNING_RATE", "DISCOUNT_FACTOR", "EPSILON_DECAY", "MIN_EPSILON",
+               "ACTION_EXECUTOR", "DISCRETIZER", "REWARD_ENGINE", "RECORDER", "ROLLOUT_LOG")
+
+# Seconds the collector thread waits for worker messages before
+# re-reading the worker list.
+COLLECT_TIMEOUT = 1.0
+
+# Worker startups that may fail in a row, e.g. on a missing ROM or a bad
+# memory map, before the pool stops restarting workers.
+MAX_STARTUP_FAILURES = 3
+
+
+class EmulatorWorker:
+    """
+    One initialized headless emulator that runs jobs back to back.
+
+    A job is a function called as `fn(worker, *args, **kwargs)`; it uses
+    `worker.pyboy`, `worker.game` and `worker.start_state`. Before every
+    job the emulator is restored to the cached start state and the
+    JOB_GLOBALS of agent.py are put back, so jobs cannot see each other's
+    settings. Can also be used directly in-process.
+    """
+
+    def __init__(self, rom_path=agent.ROM_PATH):
+        from emulator import create_emulator
+        from game_state import GameState
+        from start_state import StartStateCache
+
+        self.rom_path = rom_path
+        self.pyboy = create_emulator(rom_path, headless=True)
+        self.game = GameState(self.pyboy)
+        self.start_state = StartStateCache(self.pyboy, rom_path, MENU_MACRO)
+        self.start_state.prepare()
+        self._defaults = {name: getattr(agent, name) for name in JOB_GLOBALS}
+        self.jobs_run = 0
+
+    def reset(self):
+        """Restore the start state and agent.py's job globals."""
+        for name, value in self._defaults.items():
+            setattr(agent, name, value)
+        self.start_state.restore()
+
+    def run(self, fn, *args, **kwargs):
+        """Reset, then run one job and return its result."""
+        self.reset()
+        self.jobs_run += 1
+        return fn(self, *args, **kwargs)
+
+    def close(self):
+        if self.pyboy is not None:
+            self.pyboy.stop(save=False)
+            self.pyboy = None
+
+
+def _pool_worker(rom_path, conn):
+    """
+    Worker process: build an EmulatorWorker once, then run jobs from `conn`
+    until None arrives. The outcome of the setup is reported first, as
+    (None, True, None) or (None, False, traceback).
+    """
+    worker = None
+    try:
+        try:
+            worker = EmulatorWorker(rom_path)
+        except Exception:
+            conn.send((None, False, traceback.format_exc()))
+            return
+        conn.send((None, True, None))
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            job_id, fn, args, kwargs = job
+            try:
+                conn.send((job_id, True, worker.run(fn, *args, **kwargs)))
+            except Exception:
+                conn.send((job_id, False, traceback.format_exc()))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        if worker is not None:
+            worker.close()
+        conn.close()
+
+
+class EmulatorPool:
+    """
+    Long-lived pool of emulator worker processes.
+
+    Each worker pays for PyBoy construction, ROM load and the start state
+    once; after that a job only costs a state restore. Jobs are queued
+    here and handed to idle workers over their own pipes, so the pool
+    always knows which job a worker is running. `submit` returns a
+    concurrent.futures.Future, usable with `result()` or `as_completed`.
+    A worker that dies fails the job it was running and is replaced. After
+    MAX_STARTUP_FAILURES failed startups in a row workers are no longer
+    replaced, and once none is left every job fails with the startup
+    traceback.
+    """
+
+    def __init__(self, num_workers, rom_path=agent.ROM_PATH):
+        self.num_workers = num_workers
+        self.rom_path = rom_path
+        self._ctx = mp.get_context(START_METHOD)
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._queued = deque()
+        self._idle = deque(range(num_workers))
+        self._running = {}
+        self._next_job = 0
+        self._stopping = False
+        self._closed = False
+        self._dead = set()
+        self._startup_failures = 0
+        self._startup_error = None
+        self.processes = []
+        self.connections = []
+        for _ in range(num_workers):
+            process, conn = self._start_worker()
+            self.processes.append(process)
+            self.connections.append(conn)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_pool_worker, args=(self.rom_path, child_conn), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a job for the next idle worker.
+
+        Args:
+            fn: Module-level function called as fn(worker, *args, **kwargs)
+
+        Returns:
+            Future: Resolves to the job's return value
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            if self._stopping:
+                raise RuntimeError("submit called on a closed EmulatorPool")
+            if len(self._dead) == self.num_workers:
+                future.set_exception(self._startup_exception())
+                return future
+            job_id = self._next_job
+            self._next_job += 1
+            self._futures[job_id] = future
+            self._queued.append((job_id, fn, args, kwargs))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """Hand queued jobs to idle workers. Called with the lock held."""
+        while self._idle and self._queued:
+            index = self._idle.popleft()
+            job = self._queued.popleft()
+            self._running[index] = job[0]
+            try:
+                self.connections[index].send(job)
+            except (BrokenPipeError, OSError):
+                # The worker is dead; the collector fails this job and replaces it.
+                pass
+
+    def _resolve(self, job_id, ok, payload):
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+        if future is None:
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(f"Job {job_id} failed in an emulator worker:\n{payload}"))
+
+    def _startup_exception(self):
+        return RuntimeError(f"Emulator workers failed to start:\n{self._startup_error}")
+
+    def _collect(self):
+        """Collector thread: resolve futures from worker results and replace dead workers."""
+        while not self._closed:
+            with self._lock:
+                connections = {conn: index for index, conn in enumerate(self.connections)
+                               if index not in self._dead}
+                sentinels = {process.sentinel: index for index, process in enumerate(self.processes)
+                             if index not in self._dead}
+            for ready in wait([*connections, *sentinels], timeout=COLLECT_TIMEOUT):
+                if ready in connections:
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        continue
+                    self._receive(connections[ready], *message)
+                elif not self._stopping:
+                    self._replace_worker(sentinels[ready])
+
+    def _receive(self, index, job_id, ok, payload):
+        """Handle one message from worker `index`: a startup report or a job result."""
+        if job_id is None:
+            with self._lock:
+                if ok:
+                    self._startup_failures = 0
+                    return
+                self._startup_failures += 1
+                self._startup_error = payload
+                job_id = self._running.pop(index, None)
+                future = self._futures.pop(job_id, None) if job_id is not None else None
+            print(f"Warning: Emulator worker {index} failed to start: {payload.strip().splitlines()[-1]}")
+            if future is not None:
+                future.set_exception(self._startup_exception())
+            return
+        self._resolve(job_id, ok, payload)
+        with self._lock:
+            self._running.pop(index, None)
+            self._idle.append(index)
+            self._dispatch()
+
+    def _replace_worker(self, index):
+        process = self.processes[index]
+        process.join()
+        conn = self.connections[index]
+        # Read a startup failure report the worker sent before exiting.
+        try:
+            while conn.poll():
+                self._receive(index, *conn.recv())
+        except (EOFError, OSError):
+            pass
+        queued = []
+        with self._lock:
+            job_id = self._running.pop(index, None)
+            future = self._futures.pop(job_id, None) if job_id is not None else None
+            conn.close()
+            give_up = self._startup_failures >= MAX_STARTUP_FAILURES
+            if give_up:
+                self._dead.add(index)
+                if index in self._idle:
+                    self._idle.remove(index)
+                if len(self._dead) == self.num_workers:
+                    queued = [self._futures.pop(job[0]) for job in self._queued]
+                    self._queued.clear()
+            else:
+                self.processes[index], self.connections[index] = self._start_worker()
+                if index not in self._idle:
+                    self._idle.append(index)
+                self._dispatch()
+        if give_up:
+            print(f"Warning: Emulator worker {index} exited after {self._startup_failures} failed startups "
+                  f"in a row, not restarting it")
+        else:
+            print(f"Warning: Emulator worker {index} exited with code {process.exitcode}, restarting it")
+        if future is not None:
+            future.set_exception(RuntimeError(f"Emulator worker {index} died while running job {job_id}"))
+        for queued_future in queued:
+            queued_future.set_exception(self._startup_exception())
+
+    def close(self):
+        """Fail the jobs still queued and stop the workers after their current jobs."""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            queued = [self._futures.pop(job[0]) for job in self._queued]
+            self._queued.clear()
+            for conn in self.connections:
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+        for future in queued:
+            future.set_exception(RuntimeError("EmulatorPool closed before the job ran"))
+        for process in self.processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self._closed = True
+        self._collector.join()
+        with self._lock:
+            running, self._futures = self._futures, {}
+        for future in running.values():
+            future.set_exception(RuntimeError("Emulator worker stopped before the job finished"))
+        for conn in self.connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()